@@ -0,0 +1,58 @@
+import argparse
+import timeit
+
+import numpy as np
+
+from teimpy import DeltaRenderer, Mode, get_drawer
+
+
+def _get_frames(height, width, count):
+    """
+    Frames of a dashboard whose small gauge moves on static content.
+    """
+    tics = np.linspace(0, 255, width).astype(np.uint8)
+    base = np.repeat(np.tile(tics, (height, 1)), 3).reshape(height, width, 3)
+    for i in range(count):
+        frame = base.copy()
+        left = (8 * i) % (width - 16)
+        frame[8:24, left : left + 16] = [255, 0, 0]
+        yield frame
+
+
+def main():
+    parser = argparse.ArgumentParser(description="delta renderer benchmark")
+    parser.add_argument("--height", type=int, default=120)
+    parser.add_argument("--width", type=int, default=200)
+    parser.add_argument("--frames", type=int, default=50)
+    args = parser.parse_args()
+
+    frames = list(_get_frames(args.height, args.width, args.frames))
+    for mode in [Mode.HALF_BLOCK, Mode.HALF_BLOCK_256, Mode.BRAILLE]:
+        drawer = get_drawer(mode)
+        options = {"shrink_to_terminal": False}
+        if mode == Mode.BRAILLE:
+            options["dither"] = "ordered"
+
+        full_bytes = sum(len(drawer.draw(f, **options).encode()) for f in frames)
+        full_time = timeit.timeit(
+            lambda: [drawer.draw(f, **options) for f in frames], number=1
+        )
+        renderer = DeltaRenderer(drawer)
+        delta_bytes = sum(len(renderer.render(f, **options).encode()) for f in frames)
+        renderer.reset()
+        delta_time = timeit.timeit(
+            lambda: [renderer.render(f, **options) for f in frames], number=1
+        )
+        print(
+            "{}: full {} bytes {:.2f} ms, delta {} bytes {:.2f} ms per frame".format(
+                mode,
+                full_bytes // len(frames),
+                1e3 * full_time / len(frames),
+                delta_bytes // len(frames),
+                1e3 * delta_time / len(frames),
+            )
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,40 @@
+import argparse
+import timeit
+from ctypes import c_int, c_void_p
+
+from teimpy import libsixel
+
+
+def _set_pixelformat_with_redeclaration(dither, pixelformat):
+    # the way the bindings declared prototypes before they were bound once
+    lib = libsixel._lib()
+    lib.sixel_dither_set_pixelformat.restype = None
+    lib.sixel_dither_set_pixelformat.argtypes = [c_void_p, c_int]
+    lib.sixel_dither_set_pixelformat(dither, pixelformat)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="per-call cost of libsixel bindings")
+    parser.add_argument("--number", type=int, default=100000)
+    args = parser.parse_args()
+
+    elapsed = timeit.timeit(libsixel._lib, number=1)
+    print("load: {:.3f} ms".format(1e3 * elapsed))
+
+    dither = libsixel.sixel_dither_get(libsixel.SIXEL_BUILTIN_G8)
+    pixelformat = libsixel.SIXEL_PIXELFORMAT_G8
+    try:
+        for name, func in [
+            ("redeclared", _set_pixelformat_with_redeclaration),
+            ("prebound", libsixel.sixel_dither_set_pixelformat),
+        ]:
+            elapsed = timeit.timeit(
+                lambda: func(dither, pixelformat), number=args.number
+            )
+            print("{}: {:.3f} us/call".format(name, 1e6 * elapsed / args.number))
+    finally:
+        libsixel.sixel_dither_unref(dither)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,37 @@
+import argparse
+import os
+import tempfile
+import time
+
+import numpy as np
+
+from teimpy import Mode, get_drawer
+
+
+def main():
+    parser = argparse.ArgumentParser(description="memory mapped array benchmark")
+    parser.add_argument("--height", type=int, default=50000)
+    parser.add_argument("--width", type=int, default=50000)
+    parser.add_argument("--mode", default="half_block")
+    parser.add_argument("--path", default=None)
+    args = parser.parse_args()
+
+    path = args.path or os.path.join(tempfile.gettempdir(), "teimpy_memmap.raw")
+    shape = (args.height, args.width)
+    if not os.path.exists(path) or os.path.getsize(path) != args.height * args.width:
+        buffer = np.memmap(path, np.uint8, "w+", shape=shape)
+        for top in range(0, args.height, 1024):
+            rows = buffer[top : top + 1024]
+            rows[:] = (np.arange(rows.shape[1]) >> 8).astype(np.uint8)
+        buffer.flush()
+        del buffer
+
+    buffer = np.memmap(path, np.uint8, "r", shape=shape)
+    drawer = get_drawer(Mode(args.mode))
+    start = time.perf_counter()
+    drawer.draw(buffer)
+    print("{}: {:.2f} s".format(args.mode, time.perf_counter() - start))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,35 @@
+import argparse
+import timeit
+
+import numpy as np
+from PIL import Image
+
+from teimpy.impl.util import RESAMPLES, resize
+
+
+def main():
+    parser = argparse.ArgumentParser(description="resize benchmark")
+    parser.add_argument("--height", type=int, default=2160)
+    parser.add_argument("--width", type=int, default=3840)
+    parser.add_argument("--resized-height", type=int, default=96)
+    parser.add_argument("--resized-width", type=int, default=160)
+    parser.add_argument("--number", type=int, default=5)
+    args = parser.parse_args()
+
+    buffer = np.random.RandomState(0).randint(
+        0, 256, (args.height, args.width, 3), np.uint8
+    )
+    resized_shape = (args.resized_height, args.resized_width)
+    size = (args.resized_width, args.resized_height)
+    for name in RESAMPLES:
+        cases = [
+            ("PIL", lambda: Image.fromarray(buffer).resize(size, RESAMPLES[name])),
+            ("teimpy", lambda: resize(buffer, resized_shape, name)),
+        ]
+        for engine, func in cases:
+            elapsed = timeit.timeit(func, number=args.number)
+            print("{} {}: {:.1f} ms".format(name, engine, 1e3 * elapsed / args.number))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,59 @@
+import argparse
+import timeit
+
+import numpy as np
+
+from teimpy import SixelDeltaRenderer, set_terminal_geometry
+from teimpy.impl.sixel import SixelDrawer
+
+
+def _get_frames(height, width, count):
+    """
+    Frames of a dashboard whose small gauge moves on static content.
+    """
+    tics = np.linspace(0, 255, width).astype(np.uint8)
+    base = np.repeat(np.tile(tics, (height, 1)), 3).reshape(height, width, 3)
+    for i in range(count):
+        frame = base.copy()
+        left = (8 * i) % (width - 32)
+        frame[16:48, left : left + 32] = [255, 0, 0]
+        yield frame
+
+
+def main():
+    parser = argparse.ArgumentParser(description="sixel delta renderer benchmark")
+    parser.add_argument("--height", type=int, default=480)
+    parser.add_argument("--width", type=int, default=640)
+    parser.add_argument("--frames", type=int, default=50)
+    args = parser.parse_args()
+
+    set_terminal_geometry(50, 100)
+    frames = list(_get_frames(args.height, args.width, args.frames))
+    drawer = SixelDrawer(encoder="numpy")
+    options = {"shrink_to_terminal": False, "palette": "xterm256"}
+    full_bytes = sum(len(drawer.draw_bytes(f, **options)) for f in frames)
+    full_time = timeit.timeit(
+        lambda: [drawer.draw_bytes(f, **options) for f in frames], number=1
+    )
+
+    renderer = SixelDeltaRenderer("xterm256")
+    delta_bytes = sum(
+        len(renderer.render_bytes(f, shrink_to_terminal=False)) for f in frames
+    )
+    renderer.reset()
+    delta_time = timeit.timeit(
+        lambda: [renderer.render_bytes(f, shrink_to_terminal=False) for f in frames],
+        number=1,
+    )
+    print(
+        "full {} bytes {:.2f} ms, delta {} bytes {:.2f} ms per frame".format(
+            full_bytes // len(frames),
+            1e3 * full_time / len(frames),
+            delta_bytes // len(frames),
+            1e3 * delta_time / len(frames),
+        )
+    )
+
+
+if __name__ == "__main__":
+    main()
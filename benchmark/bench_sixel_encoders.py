@@ -0,0 +1,62 @@
+import argparse
+import timeit
+
+import numpy as np
+
+from teimpy.impl.sixel import SixelDrawer
+from teimpy.libsixel import is_loadable
+from teimpy.shape import ShapeByPixels
+
+
+def _get_images(height, width):
+    y, x = np.mgrid[0:height, 0:width]
+    gradient = np.stack(
+        [x * 255 // width, y * 255 // height, (x + y) * 255 // (height + width)],
+        axis=-1,
+    ).astype(np.uint8)
+    noise = np.random.RandomState(0).randint(0, 256, (height, width, 3), np.uint8)
+    labels = (y // 32 * 7 + x // 48) % 20
+    colors = np.random.RandomState(1).randint(0, 256, (20, 3), np.uint8)
+    return {
+        "gradient": (gradient, None),
+        "noise": (noise, None),
+        "gray": (gradient[..., 0].copy(), None),
+        "labels as rgb": (colors[labels], None),
+        "labels with palette": (labels, colors),
+        "labels as rgb with websafe": (colors[labels], "websafe"),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="sixel encoders benchmark")
+    parser.add_argument("--height", type=int, default=384)
+    parser.add_argument("--width", type=int, default=640)
+    parser.add_argument("--number", type=int, default=10)
+    parser.add_argument("--workers", type=int, default=1)
+    args = parser.parse_args()
+
+    # libsixel encodes serially
+    encoders = ["libsixel", "numpy"] if is_loadable() else ["numpy"]
+    if 1 < args.workers:
+        encoders = ["numpy"]
+    shape = ShapeByPixels(args.height, args.width)
+    for name, (buffer, palette) in _get_images(args.height, args.width).items():
+        for encoder in encoders:
+            drawer = SixelDrawer(encoder, args.workers)
+
+            def draw():
+                return drawer.draw_bytes(
+                    buffer, shape, shrink_to_terminal=False, palette=palette
+                )
+
+            result = draw()
+            elapsed = timeit.timeit(draw, number=args.number)
+            print(
+                "{} {}: {:.1f} ms, {} bytes".format(
+                    name, encoder, 1e3 * elapsed / args.number, len(result)
+                )
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,44 @@
+import argparse
+import timeit
+
+import numpy as np
+
+from teimpy import Mode, ShapeByPixels, Viewport, get_drawer
+
+
+def main():
+    parser = argparse.ArgumentParser(description="viewport benchmark")
+    parser.add_argument("--height", type=int, default=32768)
+    parser.add_argument("--width", type=int, default=32768)
+    parser.add_argument("--mode", default="half_block")
+    parser.add_argument("--number", type=int, default=20)
+    args = parser.parse_args()
+
+    buffer = np.zeros((args.height, args.width), np.uint8)
+    buffer[:] = (np.arange(args.width) >> 7).astype(np.uint8)
+    drawer = get_drawer(Mode(args.mode))
+    viewport = Viewport(drawer, buffer, (96, 160))
+
+    elapsed = timeit.timeit(viewport.draw, number=1)
+    print("first draw with building pyramid: {:.1f} ms".format(1e3 * elapsed))
+    for key in ["+", "l", "j", "-", "+", "+", "+"]:
+        viewport.press(key)
+        elapsed = timeit.timeit(viewport.draw, number=args.number)
+
+        # redrawing the crop of the original buffer as without the viewport
+        level, top, left, height, width = viewport.get_window()
+        scale = 2**level
+        crop = buffer[
+            top * scale : (top + height) * scale, left * scale : (left + width) * scale
+        ]
+        shape = ShapeByPixels(*viewport.get_display_shape())
+        crop_elapsed = timeit.timeit(lambda: drawer.draw(crop, shape), number=1)
+        print(
+            "{!r} level {}: viewport {:.2f} ms, crop {:.2f} ms".format(
+                key, level, 1e3 * elapsed / args.number, 1e3 * crop_elapsed
+            )
+        )
+
+
+if __name__ == "__main__":
+    main()
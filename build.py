@@ -1,13 +1,21 @@
 import os
+import sys
 import urllib.request
 
 ARCHIVE_FILE = "libsixel-1.8.6.tar.gz"
 LIBSIXEL_DIR = "sixel-1.8.6"
 
 
-def build(setup_kwargs):
+def _build_libsixel():
+    """
+    Download and build libsixel, and return whether libsixel.so is built.
+    """
     url = f"https://github.com/saitoha/libsixel/releases/download/v1.8.6/{ARCHIVE_FILE}"
-    urllib.request.urlretrieve(url, f"./{ARCHIVE_FILE}")
+    try:
+        urllib.request.urlretrieve(url, f"./{ARCHIVE_FILE}")
+    except OSError as e:
+        print(f"Failed to download libsixel: {e}", file=sys.stderr)
+        return False
 
     commands = f"""tar -zxvf {ARCHIVE_FILE} && \
 cd {LIBSIXEL_DIR} && \
@@ -16,7 +24,19 @@ make -j && \
 cp ./src/.libs/libsixel.so ../src/teimpy/libsixel/libsixel.so
 """
 
-    os.system(commands)
+    status = os.system(commands)
+    if status != 0:
+        print(f"Failed to build libsixel: exit status {status}", file=sys.stderr)
+        return False
+    return True
+
+
+def build(setup_kwargs):
+    # teimpy works without libsixel by the numpy sixel encoder
+    if not _build_libsixel():
+        print("Installing teimpy without libsixel.", file=sys.stderr)
+        return
+
     setup_kwargs.update(
         {
             "ext_modules": EmptyListWithLength(),
@@ -2,6 +2,19 @@ import pkg_resources
 
 from .shape import ShapeByCells, ShapeByPixels, ShapeByRatio  # noqa
 from .drawer import Mode, get_drawer  # noqa
+from .player import Player, PlayerStats  # noqa
+from .impl.cache import CachedDrawer, RenderCache  # noqa
+from .impl.delta import DeltaRenderer  # noqa
+from .impl.sixel import SixelDeltaRenderer  # noqa
+from .impl.terminal import (  # noqa
+    TerminalGeometry,
+    disable_geometry_cache,
+    enable_geometry_cache,
+    get_terminal_geometry,
+    reset_terminal_geometry,
+    set_terminal_geometry,
+)
+from .impl.viewport import ImagePyramid, Viewport  # noqa
 
 try:
     __version__ = pkg_resources.get_distribution("teimpy").version
@@ -2,38 +2,74 @@ from enum import Enum
 
 from .impl.braille import BrailleDrawer
 from .impl.iterm2_inline_image import Iterm2InlineImageDrawer
-from .impl.block import BlockDrawer
+from .impl.block import BlockDrawer, QuadrantDrawer, SextantDrawer
 from .impl.sixel import SixelDrawer
+from .impl.cache import CachedDrawer, RenderCache
 
 
 class Mode(Enum):
     BRAILLE = "braille"
+    COLOR_BRAILLE = "color_braille"
     ITERM2_INLINE_IMAGE = "iterm2_inline_image"
     HALF_BLOCK = "half_block"
+    HALF_BLOCK_256 = "half_block_256"
+    HALF_BLOCK_16 = "half_block_16"
+    QUADRANT = "quadrant"
+    SEXTANT = "sextant"
     SIXEL = "sixel"
 
     def __str__(self):
         return self.value
 
 
-def get_drawer(mode=Mode.BRAILLE):
+def get_drawer(mode=Mode.BRAILLE, cache=None):
     """
     Get drawer by specified mode.
+    If RenderCache is given as cache, drawn results are memoized in it.
     >>> drawer = get_drawer()
     >>> assert isinstance(drawer, BrailleDrawer)
+    >>> drawer = get_drawer(Mode.COLOR_BRAILLE)
+    >>> assert isinstance(drawer, BrailleDrawer) and drawer.palette == "truecolor"
     >>> drawer = get_drawer(Mode.ITERM2_INLINE_IMAGE)
     >>> assert isinstance(drawer, Iterm2InlineImageDrawer)
     >>> drawer = get_drawer(Mode.HALF_BLOCK)
     >>> assert isinstance(drawer, BlockDrawer)
+    >>> drawer = get_drawer(Mode.HALF_BLOCK_256)
+    >>> assert isinstance(drawer, BlockDrawer) and drawer.palette == "xterm256"
+    >>> drawer = get_drawer(Mode.HALF_BLOCK_16)
+    >>> assert isinstance(drawer, BlockDrawer) and drawer.palette == "ansi16"
+    >>> drawer = get_drawer(Mode.QUADRANT)
+    >>> assert isinstance(drawer, QuadrantDrawer)
+    >>> drawer = get_drawer(Mode.SEXTANT)
+    >>> assert isinstance(drawer, SextantDrawer)
     >>> drawer = get_drawer(Mode.SIXEL)
     >>> assert isinstance(drawer, SixelDrawer)
+    >>> drawer = get_drawer(Mode.HALF_BLOCK, cache=RenderCache())
+    >>> assert isinstance(drawer, CachedDrawer)
     """
+    drawer = _get_drawer(mode)
+    if cache is not None:
+        return CachedDrawer(drawer, cache)
+    return drawer
+
+
+def _get_drawer(mode):
     if mode == Mode.BRAILLE:
         return BrailleDrawer()
+    elif mode == Mode.COLOR_BRAILLE:
+        return BrailleDrawer("truecolor")
     elif mode == Mode.ITERM2_INLINE_IMAGE:
         return Iterm2InlineImageDrawer()
     elif mode == Mode.HALF_BLOCK:
         return BlockDrawer()
+    elif mode == Mode.HALF_BLOCK_256:
+        return BlockDrawer("xterm256")
+    elif mode == Mode.HALF_BLOCK_16:
+        return BlockDrawer("ansi16")
+    elif mode == Mode.QUADRANT:
+        return QuadrantDrawer()
+    elif mode == Mode.SEXTANT:
+        return SextantDrawer()
     elif mode == Mode.SIXEL:
         return SixelDrawer()
     else:
@@ -1,61 +1,231 @@
 import numpy as np
-from itertools import zip_longest, repeat
 
 from .base import DrawerBase
 from ..shape import ShapeByPixels
-from .util import convert_to_pil_image, pad_to_multiple_of_shape, get_resized_shape
+from .normalize import as_channel_last, fit
+from .util import pad_to_multiple_of_shape, get_resized_shape
+from .palette import TERMINAL_PALETTES, convert_to_colors
+from .sgr import (
+    ABSENT,
+    Cells,
+    cell_fields,
+    constant_field,
+    count_field_bytes,
+    elide_repeated_colors,
+    eol_field,
+    make_byte_table,
+    pack_byte_fields,
+)
 
 
-def _resize(buffer, resized_shape):
+def _get_cell_fields(cells, glyph_table, palette, elide_repeated_sgr=False):
+    if elide_repeated_sgr:
+        cells = cells._replace(
+            fg=elide_repeated_colors(cells.fg), bg=elide_repeated_colors(cells.bg)
+        )
+    return [*cell_fields(cells, glyph_table, palette), eol_field(cells.glyphs.shape)]
+
+
+def _count_elided_bytes(cells, glyph_table, palette):
     """
-    Resize to displaing image size
-    >>> buffer = np.arange(9).reshape(3,3).astype(np.uint8)
-    >>> resized = _resize(buffer, (9, 9))
-    >>> resized.shape
-    (9, 9)
+    Count bytes which are saved by eliding repeated colors.
+    >>> buffer = np.array([[[1, 2, 3], [1, 2, 3]], [[4, 5, 6], [7, 8, 9]]])
+    >>> _count_elided_bytes(_split_2x1_cells(buffer, "truecolor"), _HALF_BLOCK_GLYPHS, "truecolor")
+    13
     """
-    img = convert_to_pil_image(buffer)
-    img = img.resize((resized_shape[1], resized_shape[0]))
-    return np.asarray(img)
+    full = count_field_bytes(_get_cell_fields(cells, glyph_table, palette))
+    elided = count_field_bytes(_get_cell_fields(cells, glyph_table, palette, True))
+    return full - elided
+
+
+_HALF_BLOCK_GLYPHS = make_byte_table(["▀"])
 
 
-def _pack_2x1_by_half_block_code(buffer):
+def _split_2x1_cells(buffer, palette):
+    colors = convert_to_colors(buffer, palette)
+    upper = colors[::2]
+    lower = np.full(upper.shape, ABSENT, dtype=np.int16)
+    lower[: colors.shape[0] // 2] = colors[1::2]
+    glyphs = np.zeros(upper.shape[:2], dtype=np.intp)
+    return Cells(glyphs, upper, lower)
+
+
+def _pack_2x1_by_half_block_code(buffer, palette="truecolor", elide_repeated_sgr=False):
     """
     Pack 2x1 3 channel pixels into one half top block with bgcolor.
     >>> _pack_2x1_by_half_block_code(np.array([[[0, 255, 0]], [[255, 0, 0]]]))
     '\\x1b[48;2;255;0;0m\\x1b[38;2;0;255;0m▀'
+
+    The lower half of the last line is left without bgcolor if the height is odd.
+    >>> _pack_2x1_by_half_block_code(np.array([[[1, 2, 3], [4, 5, 6]]]))
+    '\\x1b[38;2;1;2;3m▀\\x1b[38;2;4;5;6m▀'
+
+    Colors which are the same as the previous cell are omitted if elide_repeated_sgr is True.
+    >>> buffer = np.array([[[1, 2, 3], [1, 2, 3]]])
+    >>> _pack_2x1_by_half_block_code(buffer, elide_repeated_sgr=True)
+    '\\x1b[38;2;1;2;3m▀▀'
+
+    Colors are quantized to the palette if palette is not truecolor.
+    >>> buffer = np.array([[[0, 255, 0]], [[255, 0, 0]]], dtype=np.uint8)
+    >>> _pack_2x1_by_half_block_code(buffer, "xterm256")
+    '\\x1b[48;5;196m\\x1b[38;5;46m▀'
+    >>> _pack_2x1_by_half_block_code(buffer, "ansi16")
+    '\\x1b[101m\\x1b[92m▀'
+    """
+    cells = _split_2x1_cells(buffer, palette)
+    fields = _get_cell_fields(cells, _HALF_BLOCK_GLYPHS, palette, elide_repeated_sgr)
+    return pack_byte_fields(fields).decode("utf-8")
+
+
+def _get_sextant_glyph(pattern):
+    """
+    Get the sextant glyph whose filled parts are given by pattern bits.
+    >>> _get_sextant_glyph(1), _get_sextant_glyph(21), _get_sextant_glyph(62)
+    ('🬀', '▌', '🬻')
     """
+    glyph = {0: " ", 21: "▌", 42: "▐", 63: "█"}.get(pattern)
+    if glyph is None:
+        glyph = chr(0x1FB00 + pattern - 1 - int(21 < pattern) - int(42 < pattern))
+    return glyph
 
-    def _pack_line(ul, ll):
-        def _pack(u, l):
-            res = []
-            if l is not None:
-                res.append("\x1b[48;2;{};{};{}m".format(*l))
-            res.append("\x1b[38;2;{};{};{}m▀".format(*u))
-            return "".join(res)
 
-        return "".join([_pack(u, l) for u, l in zip(ul, ll)])
+# the i-th bit of index is the i-th pixel of the cell in row major order.
+_QUADRANT_GLYPHS = make_byte_table(list(" ▘▝▀▖▌▞▛▗▚▐▜▄▙▟█"))
+_SEXTANT_GLYPHS = make_byte_table([_get_sextant_glyph(i) for i in range(64)])
+
+
+def _fit_two_colors(buffer, cell_shape):
+    """
+    Split pixels of each cell into fg and bg along the channel with the largest range.
+    >>> buffer = np.array([[[0, 0, 0], [10, 250, 0]], [[20, 240, 0], [0, 10, 0]]])
+    >>> mask, fg, bg = _fit_two_colors(buffer, (2, 2))
+    >>> mask
+    array([[[False,  True,  True, False]]])
+    >>> fg, bg
+    (array([[[ 15, 245,   0]]], dtype=uint8), array([[[0, 5, 0]]], dtype=uint8))
+    """
+    row_cells = buffer.shape[0] // cell_shape[0]
+    col_cells = buffer.shape[1] // cell_shape[1]
+    cells = (
+        buffer.reshape(row_cells, cell_shape[0], col_cells, cell_shape[1], 3)
+        .transpose(0, 2, 1, 3, 4)
+        .reshape(row_cells, col_cells, -1, 3)
+        .astype(np.int32)
+    )
 
-    resources = zip_longest(buffer[::2], buffer[1::2], fillvalue=repeat(None))
-    res = [_pack_line(upper, lower) for upper, lower in resources]
-    return "\x1b[0m\n".join(res)
+    lo = cells.min(axis=2)
+    hi = cells.max(axis=2)
+    channel = np.argmax(hi - lo, axis=-1)[..., np.newaxis]
+    values = np.take_along_axis(cells, channel[..., np.newaxis], axis=-1)[..., 0]
+    threshold = np.take_along_axis(lo + hi, channel, axis=-1)
+    mask = threshold < 2 * values
+
+    counts = mask.sum(axis=-1)[..., np.newaxis]
+    fg_sums = (cells * mask[..., np.newaxis]).sum(axis=2)
+    bg_sums = cells.sum(axis=2) - fg_sums
+    bg = np.rint(bg_sums / np.maximum(cells.shape[2] - counts, 1))
+    # uniform cells have no fg pixels and use bg as fg.
+    fg = np.where(0 < counts, np.rint(fg_sums / np.maximum(counts, 1)), bg)
+    return mask, fg.astype(np.uint8), bg.astype(np.uint8)
+
+
+def _split_two_color_cells(buffer, cell_shape, palette):
+    mask, fg, bg = _fit_two_colors(buffer, cell_shape)
+    weights = 1 << np.arange(mask.shape[-1])
+    glyphs = mask.dot(weights)
+    return Cells(glyphs, convert_to_colors(fg, palette), convert_to_colors(bg, palette))
+
+
+def _pack_by_two_color_block_code(
+    buffer, cell_shape, glyph_table, palette="truecolor", elide_repeated_sgr=False
+):
+    """
+    Pack cells of 3 channel pixels into block glyphs with fgcolor and bgcolor.
+    >>> buffer = np.array([[[255, 0, 0], [0, 0, 255]], [[0, 0, 255], [0, 0, 255]]])
+    >>> _pack_by_two_color_block_code(buffer, (2, 2), _QUADRANT_GLYPHS)
+    '\\x1b[48;2;0;0;255m\\x1b[38;2;255;0;0m▘'
+    """
+    cells = _split_two_color_cells(buffer, cell_shape, palette)
+    fields = _get_cell_fields(cells, glyph_table, palette, elide_repeated_sgr)
+    return pack_byte_fields(fields).decode("utf-8")
 
 
 class BlockDrawer(DrawerBase):
     CELL_SHAPE = (2, 1)
+    GLYPHS = _HALF_BLOCK_GLYPHS
+
+    def __init__(self, palette="truecolor"):
+        if palette not in ["truecolor", *TERMINAL_PALETTES]:
+            raise ValueError("Unknown palette: {}".format(palette))
+        self.palette = palette
+        # bytes saved by elide_repeated_sgr in the last draw
+        self.saved_bytes = 0
 
     def draw(
-        self, buffer, shape=None, preserve_aspect_ratio=True, shrink_to_terminal=True
+        self,
+        buffer,
+        shape=None,
+        preserve_aspect_ratio=True,
+        shrink_to_terminal=True,
+        elide_repeated_sgr=False,
+        resample="bicubic",
+        window=None,
+        background=(0, 0, 0),
     ):
-        if buffer.dtype not in [np.uint8]:
-            raise ValueError("BlockDrawer only supports np.uin8.")
+        cells = self.get_cells(
+            buffer,
+            shape,
+            preserve_aspect_ratio,
+            shrink_to_terminal,
+            resample,
+            window,
+            background,
+        )
+        self.saved_bytes = 0
+        if elide_repeated_sgr:
+            self.saved_bytes = _count_elided_bytes(cells, self.GLYPHS, self.palette)
+        fields = _get_cell_fields(cells, self.GLYPHS, self.palette, elide_repeated_sgr)
+        return pack_byte_fields(fields).decode("utf-8")
+
+    def get_cells(
+        self,
+        buffer,
+        shape=None,
+        preserve_aspect_ratio=True,
+        shrink_to_terminal=True,
+        resample="bicubic",
+        window=None,
+        background=(0, 0, 0),
+    ):
+        """
+        Get Cells of glyph indices of GLYPHS and fg and bg colors in the palette.
+        """
+        buffer = as_channel_last(buffer)
         if shape is None:
             shape = ShapeByPixels(buffer.shape[0], buffer.shape[1])
-        if len(buffer.shape) == 2:
-            buffer = np.repeat(buffer, 3).reshape(*buffer.shape, 3)
 
         resized_shape = get_resized_shape(
             buffer, shape, self.CELL_SHAPE, preserve_aspect_ratio, shrink_to_terminal
         )
-        buffer = _resize(buffer, resized_shape)
-        return _pack_2x1_by_half_block_code(buffer)
+        buffer = fit(buffer, resized_shape, resample, window, background)
+        if buffer.ndim == 2:
+            # gray pixels are expanded to RGB without copying
+            buffer = np.broadcast_to(buffer[..., np.newaxis], (*buffer.shape, 3))
+        return self._split_cells(buffer)
+
+    def _split_cells(self, buffer):
+        return _split_2x1_cells(buffer, self.palette)
+
+
+class QuadrantDrawer(BlockDrawer):
+    CELL_SHAPE = (2, 2)
+    GLYPHS = _QUADRANT_GLYPHS
+
+    def _split_cells(self, buffer):
+        buffer = pad_to_multiple_of_shape(buffer, self.CELL_SHAPE, "edge")
+        return _split_two_color_cells(buffer, self.CELL_SHAPE, self.palette)
+
+
+class SextantDrawer(QuadrantDrawer):
+    CELL_SHAPE = (3, 2)
+    GLYPHS = _SEXTANT_GLYPHS
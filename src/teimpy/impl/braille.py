@@ -2,15 +2,63 @@ import numpy as np
 
 from .base import DrawerBase
 from ..shape import ShapeByPixels
+from .palette import TERMINAL_PALETTES, convert_to_colors
+from .normalize import as_channel_last, fit
+from .sgr import Cells, cell_fields, eol_field, make_byte_table, pack_byte_fields
 from .util import (
     convert_to_str,
     convert_to_pil_image,
     pad_to_multiple_of_shape,
     get_resized_shape,
+    resize,
 )
 
 
-def _resize_and_convert_to_binary(buffer, resized_shape):
+def _get_bayer_matrix(size):
+    """
+    Get Bayer matrix whose size is power of 2.
+    >>> _get_bayer_matrix(4)
+    array([[ 0,  8,  2, 10],
+           [12,  4, 14,  6],
+           [ 3, 11,  1,  9],
+           [15,  7, 13,  5]])
+    """
+    matrix = np.zeros((1, 1), dtype=np.int64)
+    while matrix.shape[0] < size:
+        matrix = np.block(
+            [[4 * matrix, 4 * matrix + 2], [4 * matrix + 3, 4 * matrix + 1]]
+        )
+    return matrix
+
+
+# thresholds of 8x8 Bayer matrix for 256 levels, (m + 0.5) * 256 / 64 in integers.
+_BAYER_THRESHOLDS = (4 * _get_bayer_matrix(8) + 2).astype(np.uint8)
+
+
+def _dither_ordered(buffer):
+    """
+    Binarize grayscale pixels with tiled Bayer matrix thresholds.
+    >>> _dither_ordered(np.full((2, 4), 128, dtype=np.uint8)).astype(int)
+    array([[1, 0, 1, 0],
+           [0, 1, 0, 1]])
+    """
+    height, width = buffer.shape
+    reps = (-(-height // 8), -(-width // 8))
+    thresholds = np.tile(_BAYER_THRESHOLDS, reps)[:height, :width]
+    return thresholds < buffer
+
+
+DITHERS = ["none", "ordered", "floyd_steinberg"]
+
+# dtypes of 1 channel pixels which PIL binarizes as they are.
+# The others are converted by fit, so their values follow get_default_window,
+# which keeps int32 in 0 to 255 and reads float32 in 0 to 1.
+_BINARIZABLE = [np.bool_, np.uint8]
+
+
+def _resize_and_convert_to_binary(
+    buffer, resized_shape, dither="floyd_steinberg", resample="bicubic"
+):
     """
     Resize to displaing image size and convert to binary
     >>> buffer = np.arange(9).reshape(3,3).astype(np.uint8)
@@ -19,13 +67,34 @@ def _resize_and_convert_to_binary(buffer, resized_shape):
     (9, 9)
     >>> resized.dtype
     dtype('bool')
+
+    dither selects the way to binarize from 'none', 'ordered' and 'floyd_steinberg'.
+    >>> buffer = np.array([[0, 100, 200]], dtype=np.uint8)
+    >>> _resize_and_convert_to_binary(buffer, (1, 3), "none")
+    array([[False, False,  True]])
     """
+    buffer = resize(buffer, resized_shape, resample)
+    if buffer.dtype == np.bool:
+        return buffer
+    return _convert_to_binary(convert_to_pil_image(buffer), dither)
 
-    img = convert_to_pil_image(buffer)
-    img = img.resize((resized_shape[1], resized_shape[0]))
-    if buffer.dtype != np.bool:
-        img = img.convert("1")
-    return np.asarray(img)
+
+def _convert_to_binary(img, dither):
+    """
+    Convert PIL Image to binary with the specified dither.
+    >>> img = convert_to_pil_image(np.array([[0, 100, 200]], dtype=np.uint8))
+    >>> _convert_to_binary(img, "none")
+    array([[False, False,  True]])
+    """
+    if dither == "floyd_steinberg":
+        return np.asarray(img.convert("1"))
+
+    if img.mode != "L":
+        img = img.convert("L")
+    gray = np.asarray(img)
+    if dither == "ordered":
+        return _dither_ordered(gray)
+    return 127 < gray
 
 
 def _pack_4x2_pixel_to_braille_code(buffer):
@@ -44,27 +113,145 @@ def _pack_4x2_pixel_to_braille_code(buffer):
     return buffer
 
 
+def _get_mean_color_of_dots(buffer, binary):
+    """
+    Get the mean color of lit pixels in each 4x2 cell.
+    The mean color of all pixels is used for cells without lit pixels.
+    >>> buffer = np.zeros((4, 4, 3), dtype=np.uint8)
+    >>> buffer[0, 0] = [255, 0, 0]
+    >>> buffer[1, 1] = [0, 0, 255]
+    >>> buffer[:, 2:] = [8, 8, 8]
+    >>> binary = np.zeros((4, 4), dtype=bool)
+    >>> binary[0, 0] = binary[1, 1] = True
+    >>> _get_mean_color_of_dots(buffer, binary)
+    array([[[128,   0, 128],
+            [  8,   8,   8]]], dtype=uint8)
+    """
+    row_cells = buffer.shape[0] // 4
+    col_cells = buffer.shape[1] // 2
+    cells = (
+        buffer.reshape(row_cells, 4, col_cells, 2, 3)
+        .transpose(0, 2, 1, 3, 4)
+        .reshape(row_cells, col_cells, -1, 3)
+        .astype(np.int32)
+    )
+    mask = (
+        binary.reshape(row_cells, 4, col_cells, 2)
+        .transpose(0, 2, 1, 3)
+        .reshape(row_cells, col_cells, -1, 1)
+    )
+    counts = mask.sum(axis=2)
+    sums = (cells * mask).sum(axis=2)
+    means = np.where(0 < counts, sums / np.maximum(counts, 1), cells.mean(axis=2))
+    return np.rint(means).astype(np.uint8)
+
+
+_BRAILLE_GLYPHS = make_byte_table([chr(0x2800 + i) for i in range(256)])
+
+
+def _get_color_braille_cells(buffer, binary, palette):
+    patterns = _pack_4x2_pixel_to_braille_code(binary) - 0x2800
+    colors = convert_to_colors(_get_mean_color_of_dots(buffer, binary), palette)
+    return Cells(patterns, colors, None)
+
+
+def _pack_4x2_pixel_to_color_braille_code(buffer, binary, palette="truecolor"):
+    """
+    Pack 4x2 binary pixels into one braille character with fgcolor of the lit pixels.
+    >>> buffer = np.full((4, 2, 3), 255, dtype=np.uint8)
+    >>> binary = np.array([[True, True],[False, False],[False, True],[True, False]])
+    >>> _pack_4x2_pixel_to_color_braille_code(buffer, binary)
+    '\\x1b[38;2;255;255;255m⡩'
+    >>> _pack_4x2_pixel_to_color_braille_code(buffer, binary, "xterm256")
+    '\\x1b[38;5;231m⡩'
+    """
+    cells = _get_color_braille_cells(buffer, binary, palette)
+    fields = [
+        *cell_fields(cells, _BRAILLE_GLYPHS, palette),
+        eol_field(cells.glyphs.shape),
+    ]
+    return pack_byte_fields(fields).decode("utf-8")
+
+
 class BrailleDrawer(DrawerBase):
     CELL_SHAPE = (4, 2)
+    GLYPHS = _BRAILLE_GLYPHS
+
+    def __init__(self, palette=None):
+        if palette not in [None, "truecolor", *TERMINAL_PALETTES]:
+            raise ValueError("Unknown palette: {}".format(palette))
+        # None draws monochrome braille, others draw braille with fgcolor
+        self.palette = palette
 
     def draw(
-        self, buffer, shape=None, preserve_aspect_ratio=True, shrink_to_terminal=True
+        self,
+        buffer,
+        shape=None,
+        preserve_aspect_ratio=True,
+        shrink_to_terminal=True,
+        dither="floyd_steinberg",
+        resample="bicubic",
+        window=None,
+        background=(0, 0, 0),
     ):
-        if len(buffer.shape) != 3 and buffer.shape[-1] == 1:
-            buffer = buffer.reshape(buffer.shape[0], buffer.shape[1])
-        if len(buffer.shape) != 2:
-            raise ValueError("BrailleDrawer only supports 1 channel image.")
-        if buffer.dtype not in [np.bool, np.uint8, np.int32, np.float32]:
-            raise ValueError(
-                "BrailleDrawer only supports np.bool, np.uin8, np.int32 and np.float32."
-            )
+        cells = self.get_cells(
+            buffer,
+            shape,
+            preserve_aspect_ratio,
+            shrink_to_terminal,
+            dither,
+            resample,
+            window,
+            background,
+        )
+        if self.palette is None:
+            return convert_to_str(cells.glyphs + 0x2800)
+        fields = [
+            *cell_fields(cells, self.GLYPHS, self.palette),
+            eol_field(cells.glyphs.shape),
+        ]
+        return pack_byte_fields(fields).decode("utf-8")
+
+    def get_cells(
+        self,
+        buffer,
+        shape=None,
+        preserve_aspect_ratio=True,
+        shrink_to_terminal=True,
+        dither="floyd_steinberg",
+        resample="bicubic",
+        window=None,
+        background=(0, 0, 0),
+    ):
+        """
+        Get Cells of braille patterns and fg colors, which are None for monochrome.
+        """
+        if dither not in DITHERS:
+            raise ValueError("dither must be one of {}.".format(", ".join(DITHERS)))
+        buffer = as_channel_last(buffer)
         if shape is None:
             shape = ShapeByPixels(buffer.shape[0], buffer.shape[1])
-
         resized_shape = get_resized_shape(
             buffer, shape, self.CELL_SHAPE, preserve_aspect_ratio, shrink_to_terminal
         )
-        buffer = _resize_and_convert_to_binary(buffer, resized_shape)
+        if self.palette is not None:
+            return self._get_color_cells(
+                buffer, resized_shape, dither, resample, window, background
+            )
+
+        if buffer.ndim != 2 or buffer.dtype not in _BINARIZABLE or window is not None:
+            buffer = fit(buffer, resized_shape, resample, window, background)
+        buffer = _resize_and_convert_to_binary(buffer, resized_shape, dither, resample)
+        buffer = pad_to_multiple_of_shape(buffer, self.CELL_SHAPE)
+        return Cells(_pack_4x2_pixel_to_braille_code(buffer) - 0x2800, None, None)
+
+    def _get_color_cells(
+        self, buffer, resized_shape, dither, resample, window, background
+    ):
+        buffer = fit(buffer, resized_shape, resample, window, background)
+        binary = _convert_to_binary(convert_to_pil_image(buffer).convert("L"), dither)
+        binary = pad_to_multiple_of_shape(binary, self.CELL_SHAPE)
         buffer = pad_to_multiple_of_shape(buffer, self.CELL_SHAPE)
-        buffer = _pack_4x2_pixel_to_braille_code(buffer)
-        return convert_to_str(buffer)
+        if buffer.ndim == 2:
+            buffer = np.broadcast_to(buffer[..., np.newaxis], (*buffer.shape, 3))
+        return _get_color_braille_cells(buffer, binary, self.palette)
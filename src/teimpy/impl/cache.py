@@ -0,0 +1,180 @@
+import os
+import sys
+from collections import OrderedDict
+from hashlib import sha256
+from threading import Lock
+
+import numpy as np
+
+from .terminal import get_terminal_geometry
+
+
+def _get_digest(buffer):
+    """
+    Get the digest of buffer bytes.
+    >>> _get_digest(np.zeros((2, 2), dtype=np.uint8)) == _get_digest(np.zeros(4, dtype=np.uint8))
+    True
+    """
+    return sha256(np.ascontiguousarray(buffer).data).digest()
+
+
+def _get_argument_key(value):
+    """
+    Get the key of the argument. Arrays are keyed by their bytes, dtype and shape,
+    because their repr elides elements of large arrays.
+    >>> large = np.zeros(2000, dtype=np.uint8)
+    >>> other = large.copy()
+    >>> other[1000] = 1
+    >>> _get_argument_key((large, 1)) == _get_argument_key((other, 1))
+    False
+    """
+    if isinstance(value, np.ndarray):
+        return (_get_digest(value), str(value.dtype), value.shape)
+    if isinstance(value, (list, tuple)):
+        return (type(value).__name__, tuple(_get_argument_key(v) for v in value))
+    return repr(value)
+
+
+# public attributes which drawers set as results of the last draw
+RESULT_ATTRIBUTES = ["saved_bytes"]
+
+
+def _get_config(drawer):
+    """
+    Get public attributes of the drawer other than results of the last draw.
+    >>> from .block import BlockDrawer
+    >>> _get_config(BlockDrawer("xterm256"))
+    {'palette': 'xterm256'}
+    """
+    return {
+        k: v
+        for k, v in vars(drawer).items()
+        if not k.startswith("_") and k not in RESULT_ATTRIBUTES
+    }
+
+
+def _get_key(drawer, buffer, args, kwargs):
+    """
+    Get the key of drawn result, which consists of buffer, parameters and terminal geometry.
+    >>> from .block import BlockDrawer
+    >>> buffer = np.zeros((2, 2), dtype=np.uint8)
+    >>> key = _get_key(BlockDrawer(), buffer, (), {})
+    >>> key == _get_key(BlockDrawer(), buffer.copy(), (), {})
+    True
+    >>> key == _get_key(BlockDrawer("xterm256"), buffer, (), {})
+    False
+    >>> key == _get_key(BlockDrawer(), buffer.reshape(4, 1), (), {})
+    False
+    >>> from .sixel import SixelDrawer
+    >>> _get_key(SixelDrawer("numpy"), buffer, (), {}) == _get_key(
+    ...     SixelDrawer("libsixel"), buffer, (), {}
+    ... )
+    False
+    """
+    return (
+        type(drawer).__name__,
+        tuple(
+            (k, _get_argument_key(v)) for k, v in sorted(_get_config(drawer).items())
+        ),
+        _get_digest(buffer),
+        str(buffer.dtype),
+        buffer.shape,
+        _get_argument_key(args),
+        tuple((k, _get_argument_key(v)) for k, v in sorted(kwargs.items())),
+        get_terminal_geometry(),
+        os.environ.get("TERM"),
+    )
+
+
+class RenderCache:
+    """
+    LRU cache of drawn results whose total size is bounded by max_bytes.
+    >>> cache = RenderCache(max_bytes=200)
+    >>> cache.put("a", "x" * 100)
+    >>> cache.put("b", "y" * 100)
+    >>> cache.get("a") is None, cache.get("b") == "y" * 100
+    (True, True)
+    >>> cache.hits, cache.misses
+    (1, 1)
+    """
+
+    def __init__(self, max_bytes=64 * 1024 * 1024):
+        self.max_bytes = max_bytes
+        self.total_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self._items = OrderedDict()
+        self._lock = Lock()
+
+    def __len__(self):
+        return len(self._items)
+
+    def get(self, key):
+        with self._lock:
+            item = self._items.get(key)
+            if item is None:
+                self.misses += 1
+                return None
+            self._items.move_to_end(key)
+            self.hits += 1
+            return item[0]
+
+    def put(self, key, value, size=None):
+        """
+        Put value whose size is sys.getsizeof(value) by default.
+        """
+        size = sys.getsizeof(value) if size is None else size
+        if self.max_bytes < size:
+            return
+        with self._lock:
+            if key in self._items:
+                self.total_bytes -= self._items.pop(key)[1]
+            self._items[key] = (value, size)
+            self.total_bytes += size
+            while self.max_bytes < self.total_bytes:
+                _, (_, evicted_size) = self._items.popitem(last=False)
+                self.total_bytes -= evicted_size
+
+    def clear(self):
+        with self._lock:
+            self._items.clear()
+            self.total_bytes = 0
+
+
+def _get_results(drawer):
+    return {k: v for k, v in vars(drawer).items() if k in RESULT_ATTRIBUTES}
+
+
+class CachedDrawer:
+    """
+    Drawer which memoizes results of the wrapped drawer in RenderCache.
+    Results are keyed by the public configuration of the drawer as well, so drawers
+    with different settings can share one cache. RESULT_ATTRIBUTES of the drawer,
+    like saved_bytes, are cached with the result and restored on hits.
+    >>> from .block import BlockDrawer
+    >>> drawer = CachedDrawer(BlockDrawer())
+    >>> buffer = np.zeros((2, 2), dtype=np.uint8)
+    >>> drawer.draw(buffer) == drawer.draw(buffer.copy())
+    True
+    >>> drawer.cache.hits, drawer.cache.misses
+    (1, 1)
+    """
+
+    def __init__(self, drawer, cache=None):
+        self.drawer = drawer
+        self.cache = RenderCache() if cache is None else cache
+
+    def __getattr__(self, name):
+        return getattr(self.drawer, name)
+
+    def draw(self, buffer, *args, **kwargs):
+        key = _get_key(self.drawer, buffer, args, kwargs)
+        item = self.cache.get(key)
+        if item is not None:
+            result, results = item
+            vars(self.drawer).update(results)
+            return result
+
+        result = self.drawer.draw(buffer, *args, **kwargs)
+        self.cache.put(key, (result, _get_results(self.drawer)), sys.getsizeof(result))
+        return result
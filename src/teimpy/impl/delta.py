@@ -0,0 +1,198 @@
+from functools import lru_cache
+
+import numpy as np
+
+from .sgr import (
+    ABSENT,
+    cell_fields,
+    elide_repeated_colors,
+    eol_field,
+    make_byte_table,
+    pack_byte_fields,
+)
+
+_RESET = "\x1b[0m"
+_ERASE_BELOW = "\x1b[J"
+
+
+@lru_cache(maxsize=16)
+def _get_vertical_moves(height):
+    """
+    Get the table of cursor moves whose index is height plus the number of lines down.
+    >>> moves = _get_vertical_moves(2)
+    >>> pack_byte_fields([(moves, np.array([0, 2, 3]))])
+    b'\\x1b[2A\\x1b[1B'
+    """
+    return make_byte_table(
+        ["\x1b[{}A".format(height - i) for i in range(height)]
+        + [""]
+        + ["\x1b[{}B".format(i) for i in range(1, height + 1)]
+    )
+
+
+@lru_cache(maxsize=16)
+def _get_column_moves(width):
+    """
+    Get the table of cursor moves to columns, whose last row is empty.
+    >>> moves = _get_column_moves(4)
+    >>> pack_byte_fields([(moves, np.array([0, 3, 4]))])
+    b'\\r\\r\\x1b[3C'
+    """
+    return make_byte_table(
+        ["\r"] + ["\r\x1b[{}C".format(i) for i in range(1, width)] + [""]
+    )
+
+
+_RUN_RESETS = make_byte_table([_RESET, ""])
+
+
+def _get_changed_cells(cells, previous):
+    """
+    Get the mask of cells whose glyphs or colors are changed.
+    >>> from .sgr import Cells
+    >>> previous = Cells(np.array([[0, 1]]), np.array([[[1, 2, 3], [4, 5, 6]]]), None)
+    >>> _get_changed_cells(previous._replace(glyphs=np.array([[0, 2]])), previous)
+    array([[False,  True]])
+    """
+    changed = cells.glyphs != previous.glyphs
+    for colors, previous_colors in [(cells.fg, previous.fg), (cells.bg, previous.bg)]:
+        if colors is not None:
+            different = colors != previous_colors
+            changed |= different.any(axis=-1) if different.ndim == 3 else different
+    return changed
+
+
+def _elide_in_runs(colors, firsts):
+    if colors is None:
+        return None
+    elided = np.array(colors, dtype=np.int16)
+    repeated = elided[1:] == elided[:-1]
+    if repeated.ndim == 2:
+        repeated = repeated.all(axis=-1)
+    # the first cells of runs follow the reset, so they always set their colors
+    repeated &= ~firsts[1:]
+    elided[1:][repeated] = ABSENT
+    return elided
+
+
+def _get_delta_fields(cells, changed, glyph_table, palette):
+    """
+    Get byte fields of runs of changed cells with cursor moves.
+    The cursor starts and ends at the head of the line below the cells.
+    """
+    height, width = changed.shape
+    rows, cols = np.nonzero(changed)
+    firsts = np.ones(len(rows), dtype=np.bool_)
+    firsts[1:] = (rows[1:] != rows[:-1]) | (cols[1:] != cols[:-1] + 1)
+
+    run_rows = rows[firsts]
+    lines = np.diff(run_rows, prepend=height)
+    vertical = np.full(len(rows), height, dtype=np.intp)
+    vertical[firsts] = height + lines
+    column = np.where(firsts, cols, width)
+
+    fields = [
+        (_get_vertical_moves(height), vertical),
+        (_get_column_moves(width), column),
+    ]
+    if palette is not None:
+        fields.append((_RUN_RESETS, np.where(firsts, 0, 1)))
+    changed_cells = cells._replace(
+        glyphs=cells.glyphs[rows, cols],
+        fg=None if cells.fg is None else cells.fg[rows, cols],
+        bg=None if cells.bg is None else cells.bg[rows, cols],
+    )
+    changed_cells = changed_cells._replace(
+        fg=_elide_in_runs(changed_cells.fg, firsts),
+        bg=_elide_in_runs(changed_cells.bg, firsts),
+    )
+    return fields + cell_fields(changed_cells, glyph_table, palette), run_rows[-1]
+
+
+class DeltaRenderer:
+    """
+    Renderer which rewrites only changed cells of the previous frame.
+    drawer is BrailleDrawer or BlockDrawer whose get_cells gives the cell grid.
+    Frames are redrawn fully if the fraction of changed cells exceeds threshold,
+    or the shape or the palette of cells is changed.
+    Rendered strings are written as they are, which leave the cursor at the head
+    of the line below the frame.
+    >>> from .block import BlockDrawer
+    >>> renderer = DeltaRenderer(BlockDrawer("xterm256"))
+    >>> buffer = np.zeros((4, 4, 3), dtype=np.uint8)
+    >>> full = renderer.render(buffer, shrink_to_terminal=False)
+    >>> buffer[2, 3] = 255
+    >>> renderer.render(buffer, shrink_to_terminal=False)
+    '\\x1b[1A\\r\\x1b[3C\\x1b[0m\\x1b[48;5;16m\\x1b[38;5;231m▀\\x1b[1B\\r\\x1b[0m'
+    >>> renderer.render(buffer, shrink_to_terminal=False)
+    ''
+    >>> renderer.full_redraws, renderer.changed_fraction
+    (1, 0.0)
+    """
+
+    def __init__(self, drawer, threshold=0.5):
+        if not hasattr(drawer, "get_cells"):
+            raise ValueError("{} has no cells.".format(type(drawer).__name__))
+        self.drawer = drawer
+        self.threshold = threshold
+        self.full_redraws = 0
+        self.changed_fraction = 1.0
+        self._cells = None
+        self._palette = None
+
+    def reset(self):
+        """
+        Forget the previous frame, so the next frame is drawn at the cursor fully.
+        """
+        self._cells = None
+
+    def _render_full(self, cells, previous, palette):
+        self.full_redraws += 1
+        prefix = ""
+        if previous is not None:
+            prefix = "\x1b[{}A\r".format(previous.glyphs.shape[0])
+            if previous.glyphs.shape != cells.glyphs.shape:
+                prefix += _ERASE_BELOW
+        if palette is None:
+            fields = cell_fields(cells, self.drawer.GLYPHS, palette)
+        else:
+            prefix += _RESET
+            elided = cells._replace(
+                fg=None if cells.fg is None else elide_repeated_colors(cells.fg),
+                bg=None if cells.bg is None else elide_repeated_colors(cells.bg),
+            )
+            fields = cell_fields(elided, self.drawer.GLYPHS, palette)
+        fields.append(eol_field(cells.glyphs.shape))
+        suffix = "\n" if palette is None else _RESET + "\n"
+        return prefix + pack_byte_fields(fields).decode("utf-8") + suffix
+
+    def render(self, buffer, **options):
+        """
+        Render the frame drawn by the drawer with options as a full frame or changes.
+        """
+        palette = self.drawer.palette
+        cells = self.drawer.get_cells(buffer, **options)
+        previous, self._cells = self._cells, cells
+        previous_palette, self._palette = self._palette, palette
+        if (
+            previous is None
+            or previous.glyphs.shape != cells.glyphs.shape
+            or previous_palette != palette
+        ):
+            self.changed_fraction = 1.0
+            return self._render_full(cells, previous, palette)
+
+        changed = _get_changed_cells(cells, previous)
+        self.changed_fraction = float(changed.mean())
+        if self.changed_fraction == 0.0:
+            return ""
+        if self.threshold < self.changed_fraction:
+            return self._render_full(cells, previous, palette)
+
+        fields, last_row = _get_delta_fields(
+            cells, changed, self.drawer.GLYPHS, palette
+        )
+        suffix = "\x1b[{}B\r".format(changed.shape[0] - last_row)
+        if palette is not None:
+            suffix += _RESET
+        return pack_byte_fields(fields).decode("utf-8") + suffix
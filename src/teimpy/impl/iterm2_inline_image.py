@@ -9,6 +9,8 @@ import numpy as np
 
 from .base import DrawerBase
 from ..shape import ShapeByCells, ShapeByPixels, ShapeByRatio
+from .normalize import as_channel_last, fit
+from .terminal import get_cell_pixels
 
 
 def _get_shape_property(shape=None):
@@ -51,22 +53,145 @@ def _get_shape_property(shape=None):
     return ("width", width), ("height", height)
 
 
-def _compress_image(buffer, compression="JPEG"):
+# nominal pixels of a cell, which is used to downscale images whose shape is in cells
+# if the terminal does not report its pixel size.
+CELL_SHAPE = (16, 8)
+
+
+def _get_display_pixels(buffer_shape, shape, preserve_aspect_ratio):
     """
-    Compress array to specified format.
-    >>> _compress_image(np.array([[0]]), 'JPEG')
-    '/9j/4AAQSkZJRgABAQAAAQABAAD/2wBDAAgGBgcGBQgHBwcJCQgKDBQNDAsLDBkSEw8UHRofH\
-h0aHBwgJC4nICIsIxwcKDcpLDAxNDQ0Hyc5PTgyPC4zNDL/wAALCAABAAEBAREA/8QAHwAAAQUBAQEB\
-AQEAAAAAAAAAAAECAwQFBgcICQoL/8QAtRAAAgEDAwIEAwUFBAQAAAF9AQIDAAQRBRIhMUEGE1FhByJ\
-xFDKBkaEII0KxwRVS0fAkM2JyggkKFhcYGRolJicoKSo0NTY3ODk6Q0RFRkdISUpTVFVWV1hZWmNkZW\
-ZnaGlqc3R1dnd4eXqDhIWGh4iJipKTlJWWl5iZmqKjpKWmp6ipqrKztLW2t7i5usLDxMXGx8jJytLT1\
-NXW19jZ2uHi4+Tl5ufo6erx8vP09fb3+Pn6/9oACAEBAAA/APn+v//Z'
+    Get the pixels of displaying image which never exceed the original.
+    >>> from .terminal import set_terminal_geometry, reset_terminal_geometry
+    >>> set_terminal_geometry(24, 80)
+    >>> _get_display_pixels((1000, 1000), ShapeByCells(10, 20), True)
+    (160, 160)
+    >>> set_terminal_geometry(24, 80, 480, 800)
+    >>> _get_display_pixels((1000, 1000), ShapeByCells(10, 20), True)
+    (200, 200)
+    >>> reset_terminal_geometry()
+    >>> _get_display_pixels((1000, 1000), ShapeByPixels(200, None), True)
+    (200, 200)
+    >>> _get_display_pixels((1000, 1000), ShapeByPixels(200, 2000), False)
+    (200, 1000)
+
+    The original is kept if shape is not given in cells or pixels.
+    >>> _get_display_pixels((1000, 1000), ShapeByRatio(0.5, 0.5), True)
+    (1000, 1000)
     """
-    buffer = np.uint8(buffer)
+    height, width = buffer_shape[0], buffer_shape[1]
+    if isinstance(shape, ShapeByCells):
+        cell_shape = get_cell_pixels(CELL_SHAPE)
+    elif isinstance(shape, ShapeByPixels):
+        cell_shape = (1, 1)
+    else:
+        return (height, width)
+
+    scales = [
+        1.0 if s is None else min(1.0, s * c / n)
+        for s, c, n in zip(shape, cell_shape, (height, width))
+    ]
+    if preserve_aspect_ratio:
+        given = [sc for sc, s in zip(scales, shape) if s is not None]
+        scales = [min(given, default=1.0)] * 2
+    return (
+        max(1, int(round(scales[0] * height))),
+        max(1, int(round(scales[1] * width))),
+    )
+
+
+def _convert_to_display_image(buffer, display_pixels, window=None, background=None):
+    """
+    Convert to PIL Image of display pixels, which keeps alpha if background is None.
+    >>> buffer = np.zeros((4, 40, 20), dtype=np.uint16)
+    >>> _convert_to_display_image(as_channel_last(buffer), (20, 10)).mode
+    'RGBA'
+    """
+    return Image.fromarray(fit(buffer, display_pixels, "box", window, background))
+
 
-    bio = BytesIO()
-    Image.fromarray(buffer).save(bio, compression)
-    return b64encode(bio.getvalue()).decode("utf-8")
+def _choose_compression(buffer, max_samples=4096, max_colors=256):
+    """
+    Choose PNG for images with few colors or alpha, and JPEG for others.
+    >>> _choose_compression(np.zeros((100, 100, 3), dtype=np.uint8))
+    'PNG'
+    >>> _choose_compression(np.random.RandomState(0).randint(0, 256, (100, 100, 3)))
+    'JPEG'
+    """
+    if len(buffer.shape) == 3 and buffer.shape[-1] in [2, 4]:
+        return "PNG"
+    step = max(1, int(np.sqrt(buffer.shape[0] * buffer.shape[1] / max_samples)))
+    samples = np.asarray(buffer[::step, ::step])
+    samples = samples.reshape(samples.shape[0] * samples.shape[1], -1)
+    colors = len(np.unique(samples, axis=0))
+    return "PNG" if colors <= max_colors else "JPEG"
+
+
+def _get_save_options(compression, quality, png_compress_level, optimize):
+    """
+    Get keyword arguments of PIL Image.save for the compression.
+    >>> _get_save_options("JPEG", 80, 1, True)
+    {'optimize': True, 'quality': 80}
+    >>> _get_save_options("PNG", 80, 1, False)
+    {'compress_level': 1}
+    """
+    options = {"optimize": True} if optimize else {}
+    if compression == "JPEG" and quality is not None:
+        options["quality"] = quality
+    if compression == "PNG" and png_compress_level is not None:
+        options["compress_level"] = png_compress_level
+    return options
+
+
+def _save_image(img, fp, compression="JPEG", options=None):
+    """
+    Save PIL Image to file object in specified format.
+    >>> bio = BytesIO()
+    >>> _save_image(Image.fromarray(np.zeros((1, 1), dtype=np.uint8)), bio, 'PNG')
+    >>> bio.getvalue()[:8]
+    b'\\x89PNG\\r\\n\\x1a\\n'
+    """
+    img.save(fp, compression, **(options or {}))
+
+
+# raw bytes per base64 chunk or multipart FilePart, which must be a multiple of 3.
+CHUNK_SIZE = 3 * (1 << 16)
+
+
+class _Base64ChunkWriter:
+    """
+    File-like object which base64 encodes written bytes chunk by chunk.
+    >>> chunks = []
+    >>> writer = _Base64ChunkWriter(chunks.append, chunk_size=3)
+    >>> writer.write(b"abcd")
+    4
+    >>> writer.close()
+    >>> chunks
+    [b'YWJj', b'ZA==']
+    """
+
+    def __init__(self, write_chunk, chunk_size=CHUNK_SIZE):
+        self._write_chunk = write_chunk
+        self._chunk_size = chunk_size
+        self._pending = bytearray()
+
+    def write(self, data):
+        self._pending += data
+        if self._chunk_size <= len(self._pending):
+            n = len(self._pending) - len(self._pending) % self._chunk_size
+            view = memoryview(self._pending)
+            for i in range(0, n, self._chunk_size):
+                self._write_chunk(b64encode(view[i : i + self._chunk_size]))
+            view.release()
+            del self._pending[:n]
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def close(self):
+        if self._pending:
+            self._write_chunk(b64encode(self._pending))
+            self._pending = bytearray()
 
 
 def _is_in_tmux():
@@ -85,24 +210,119 @@ def _get_st():
     return "\a"
 
 
-def _create_message(data, properties):
-    osc = _get_osc()
+def _get_properties(shape, preserve_aspect_ratio, size=None):
+    shape_property = _get_shape_property(shape)
+    size_property = [] if size is None else [("size", str(size))]
+    return OrderedDict(
+        [
+            *shape_property,
+            *size_property,
+            ("preserveAspectRatio", "1" if preserve_aspect_ratio else "0"),
+            ("inline", "1"),
+        ]
+    )
+
+
+def _write_message(stream, data, properties):
+    osc = _get_osc().encode("ascii")
+    properties = "".join([";{}={}".format(k, v) for k, v in properties.items()])
+    st = _get_st().encode("ascii")
+    stream.write(osc + "1337;File={}:".format(properties).encode("ascii"))
+    for i in range(0, len(data), CHUNK_SIZE):
+        stream.write(b64encode(data[i : i + CHUNK_SIZE]))
+    stream.write(st)
+
+
+def _write_multipart_message(stream, img, properties, compression, options):
+    osc = _get_osc().encode("ascii")
+    st = _get_st().encode("ascii")
     properties = "".join([";{}={}".format(k, v) for k, v in properties.items()])
-    st = _get_st()
-    return "{}1337;File={}:{}{}".format(osc, properties, data, st)
+
+    def _write_part(chunk):
+        stream.write(b"".join([osc, b"1337;FilePart=", chunk, st]))
+
+    stream.write(osc + "1337;MultipartFile={}".format(properties).encode("ascii") + st)
+    writer = _Base64ChunkWriter(_write_part)
+    _save_image(img, writer, compression, options)
+    writer.close()
+    stream.write(osc + b"1337;FileEnd" + st)
 
 
 class Iterm2InlineImageDrawer(DrawerBase):
-    def draw(self, buffer, shape=None, preserve_aspect_ratio=True, compression="JPEG"):
-        data = _compress_image(buffer, compression)
-
-        shape_property = _get_shape_property(shape)
-        properties = OrderedDict(
-            [
-                *shape_property,
-                ("size", str(len(data))),
-                ("preserveAspectRatio", "1" if preserve_aspect_ratio else "0"),
-                ("inline", "1"),
-            ]
+    def draw(
+        self,
+        buffer,
+        shape=None,
+        preserve_aspect_ratio=True,
+        compression="JPEG",
+        quality=None,
+        png_compress_level=None,
+        optimize=False,
+        downscale=True,
+        window=None,
+        background=None,
+    ):
+        stream = BytesIO()
+        self.draw_to(
+            stream,
+            buffer,
+            shape,
+            preserve_aspect_ratio,
+            compression,
+            quality=quality,
+            png_compress_level=png_compress_level,
+            optimize=optimize,
+            downscale=downscale,
+            window=window,
+            background=background,
         )
-        return _create_message(data, properties)
+        return stream.getvalue().decode("ascii")
+
+    def draw_to(
+        self,
+        stream,
+        buffer,
+        shape=None,
+        preserve_aspect_ratio=True,
+        compression="JPEG",
+        multipart=False,
+        quality=None,
+        png_compress_level=None,
+        optimize=False,
+        downscale=True,
+        window=None,
+        background=None,
+    ):
+        """
+        Write the image to binary stream with base64 encoding chunk by chunk.
+        The multipart protocol doesn't hold the whole compressed image in memory.
+        compression 'auto' chooses PNG or JPEG by the number of sampled colors.
+        Alpha is sent as it is unless background to composite onto is given,
+        and images with alpha are sent in PNG even if compression is 'JPEG'.
+        """
+        buffer = as_channel_last(buffer)
+        if compression == "auto":
+            compression = _choose_compression(buffer)
+        display_pixels = buffer.shape[:2]
+        if downscale:
+            display_pixels = _get_display_pixels(
+                buffer.shape, shape, preserve_aspect_ratio
+            )
+        img = _convert_to_display_image(buffer, display_pixels, window, background)
+        if compression == "JPEG" and img.mode in ["LA", "RGBA"]:
+            # JPEG has no alpha channel
+            compression = "PNG"
+        options = _get_save_options(compression, quality, png_compress_level, optimize)
+
+        if multipart:
+            properties = _get_properties(shape, preserve_aspect_ratio)
+            _write_multipart_message(stream, img, properties, compression, options)
+            return
+
+        # size property must precede data, so the compressed image is held once.
+        bio = BytesIO()
+        _save_image(img, bio, compression, options)
+        data = bio.getbuffer()
+        size = 4 * ((len(data) + 2) // 3)
+        properties = _get_properties(shape, preserve_aspect_ratio, size)
+        _write_message(stream, data, properties)
@@ -0,0 +1,184 @@
+import numpy as np
+
+from .util import decimate, get_reduction_factors, reduce_by_box, resize
+
+# the number of channels of gray, gray with alpha, RGB and RGBA
+CHANNELS = [1, 2, 3, 4]
+
+
+def as_channel_last(buffer):
+    """
+    Get the view of buffer whose channels are in the last axis.
+    Channel first arrays are transposed and a single channel is squeezed.
+    >>> as_channel_last(np.zeros((3, 20, 10), dtype=np.uint8)).shape
+    (20, 10, 3)
+    >>> as_channel_last(np.zeros((20, 10, 1), dtype=np.uint8)).shape
+    (20, 10)
+    >>> as_channel_last(np.zeros((20, 10, 5), dtype=np.uint8))
+    Traceback (most recent call last):
+    ...
+    ValueError: Buffer must be 2 dimensional with up to 4 channels.
+    """
+    buffer = np.asarray(buffer)
+    if buffer.dtype.kind not in "biuf":
+        raise ValueError("Unsupported dtype: {}".format(buffer.dtype))
+    if (
+        buffer.ndim == 3
+        and buffer.shape[-1] not in CHANNELS
+        and buffer.shape[0] in CHANNELS
+    ):
+        buffer = np.moveaxis(buffer, 0, -1)
+    if buffer.ndim == 3 and buffer.shape[-1] == 1:
+        buffer = buffer[..., 0]
+    if buffer.ndim not in [2, 3] or buffer.shape[2:] not in [(), (2,), (3,), (4,)]:
+        raise ValueError("Buffer must be 2 dimensional with up to 4 channels.")
+    return buffer
+
+
+def get_default_window(dtype):
+    """
+    Get the range of values mapped to black and white by default.
+    Unsigned integers use the range of dtype, and floats use 0 to 1.
+    Signed integers, which np.array gives for python ints, use 0 to 255 like uint8.
+    >>> get_default_window(np.dtype(np.uint16))
+    (0, 65535)
+    >>> get_default_window(np.dtype(np.int64))
+    (0, 255)
+    >>> get_default_window(np.dtype(np.float64))
+    (0.0, 1.0)
+    """
+    if dtype == np.bool_:
+        return (0, 1)
+    if dtype.kind == "i":
+        return (0, 255)
+    if dtype.kind == "u":
+        info = np.iinfo(dtype)
+        return (int(info.min), int(info.max))
+    return (0.0, 1.0)
+
+
+def _get_window(values, window):
+    if isinstance(window, str):
+        if window != "auto":
+            raise ValueError("window must be 'auto' or a pair of low and high.")
+        window = (np.nanmin(values), np.nanmax(values))
+        # flat images are drawn as black
+        return (float(window[0]), max(float(window[1]), float(window[0]) + 1e-6))
+
+    low, high = window
+    if not low < high:
+        raise ValueError("Window low must be less than high.")
+    return (float(low), float(high))
+
+
+def _scale(values, window):
+    """
+    Scale values in window to 0 to 255 in float32.
+    >>> _scale(np.array([0, 1024, 4096], dtype=np.uint16), (1024, 3072))
+    array([  0.,   0., 255.], dtype=float32)
+    """
+    low, high = _get_window(values, window)
+    scaled = values.astype(np.float32)
+    if scaled.dtype.kind == "f":
+        np.nan_to_num(scaled, copy=False)
+    scaled -= low
+    scaled *= 255.0 / (high - low)
+    return np.clip(scaled, 0.0, 255.0, out=scaled)
+
+
+def _composite(values, alpha, background):
+    """
+    Composite scaled values onto background with alpha in 0 to 1.
+    Gray values are kept gray if background is gray.
+    >>> _composite(np.array([[200.0]]), np.array([[0.5]]), (0, 0, 0))
+    array([[100.]])
+    >>> _composite(np.array([[200.0]]), np.array([[0.5]]), (0, 0, 100))
+    array([[[100., 100., 150.]]])
+    """
+    background = np.asarray(background, dtype=np.float32).reshape(-1)
+    if values.ndim == 3:
+        alpha = alpha[..., np.newaxis]
+    elif len(background) == 3 and (background != background[0]).any():
+        values = values[..., np.newaxis]
+        alpha = alpha[..., np.newaxis]
+    else:
+        background = background[0]
+    return background + (values - background) * alpha
+
+
+def convert_to_uint8(buffer, window=None, background=(0, 0, 0), dtype=None):
+    """
+    Convert pixels to uint8 with window of values which are mapped to 0 and 255.
+    window is 'auto' for the range of pixels, or a pair of low and high.
+    The alpha channel is composited onto background, or kept if background is None.
+    dtype, which is buffer.dtype by default, decides the default window and alpha range.
+    >>> convert_to_uint8(np.array([[0.0, 0.5, 2.0]]))
+    array([[  0, 128, 255]], dtype=uint8)
+    >>> convert_to_uint8(np.array([[[255, 0, 0, 128]]], dtype=np.uint8), background=255)
+    array([[[255, 127, 127]]], dtype=uint8)
+
+    uint8 pixels without alpha are returned as they are if window is not given.
+    >>> buffer = np.zeros((2, 2, 3), dtype=np.uint8)
+    >>> convert_to_uint8(buffer) is buffer
+    True
+    """
+    dtype = buffer.dtype if dtype is None else np.dtype(dtype)
+    has_alpha = buffer.ndim == 3 and buffer.shape[-1] in [2, 4]
+    if buffer.dtype == np.uint8 and window is None:
+        if not has_alpha or background is None:
+            return buffer
+
+    default = get_default_window(dtype)
+    values = buffer[..., :-1] if has_alpha else buffer
+    if values.ndim == 3 and values.shape[-1] == 1:
+        values = values[..., 0]
+    values = _scale(values, default if window is None else window)
+    if has_alpha and background is not None:
+        alpha = _scale(buffer[..., -1], default) / 255.0
+        values = _composite(values, alpha, background)
+
+    converted = np.rint(values).astype(np.uint8)
+    if has_alpha and background is None:
+        alpha = np.rint(_scale(buffer[..., -1:], default)).astype(np.uint8)
+        converted = np.concatenate(
+            [converted.reshape(*alpha.shape[:2], -1), alpha], axis=-1
+        )
+    return converted
+
+
+def _reduce(buffer, resized_shape, resample):
+    """
+    Reduce pixels by integer factors in their own dtype.
+    >>> buffer = np.arange(16, dtype=np.uint16).reshape(4, 4)
+    >>> _reduce(buffer, (2, 2), "bicubic")
+    array([[ 2.5,  4.5],
+           [10.5, 12.5]], dtype=float32)
+    >>> _reduce(buffer, (2, 2), "nearest")
+    array([[ 0,  2],
+           [ 8, 10]], dtype=uint16)
+    """
+    factors = get_reduction_factors(buffer.shape, resized_shape)
+    if max(factors) == 1:
+        return buffer
+    if resample == "nearest":
+        return buffer[:: factors[0], :: factors[1]]
+    return reduce_by_box(buffer, factors)
+
+
+def fit(buffer, resized_shape, resample="bicubic", window=None, background=(0, 0, 0)):
+    """
+    Resize pixels of any supported dtype to resized_shape as uint8.
+    Pixels are converted after downscaling, so the cost is proportional to the output.
+    >>> buffer = np.linspace(0.0, 1.0, 2000 * 1500).reshape(2000, 1500)
+    >>> fitted = fit(buffer, (40, 30))
+    >>> fitted.shape, fitted.dtype, int(fitted[0, 0]), int(fitted[-1, -1])
+    ((40, 30), dtype('uint8'), 3, 252)
+    """
+    dtype = buffer.dtype
+    if dtype == np.uint8:
+        buffer = resize(buffer, resized_shape, resample)
+        return convert_to_uint8(buffer, window, background)
+
+    buffer = _reduce(decimate(buffer, resized_shape), resized_shape, resample)
+    buffer = convert_to_uint8(buffer, window, background, dtype)
+    return resize(buffer, resized_shape, resample)
@@ -0,0 +1,125 @@
+from functools import lru_cache
+
+import numpy as np
+
+LUT_BITS = 5
+
+
+ANSI16 = np.array(
+    [
+        [0, 0, 0],
+        [205, 0, 0],
+        [0, 205, 0],
+        [205, 205, 0],
+        [0, 0, 238],
+        [205, 0, 205],
+        [0, 205, 205],
+        [229, 229, 229],
+        [127, 127, 127],
+        [255, 0, 0],
+        [0, 255, 0],
+        [255, 255, 0],
+        [92, 92, 255],
+        [255, 0, 255],
+        [0, 255, 255],
+        [255, 255, 255],
+    ],
+    dtype=np.uint8,
+)
+
+
+def _get_xterm256_colors():
+    """
+    Get xterm 256 color palette.
+    >>> colors = _get_xterm256_colors()
+    >>> colors.shape
+    (256, 3)
+    >>> colors[196], colors[244]
+    (array([255,   0,   0], dtype=uint8), array([128, 128, 128], dtype=uint8))
+    """
+    levels = np.array([0, 95, 135, 175, 215, 255])
+    cube = np.stack(np.meshgrid(levels, levels, levels, indexing="ij"), axis=-1)
+    grays = np.repeat(np.arange(8, 248, 10), 3).reshape(-1, 3)
+    return np.concatenate([ANSI16, cube.reshape(-1, 3), grays]).astype(np.uint8)
+
+
+XTERM256 = _get_xterm256_colors()
+
+
+def _get_websafe_colors():
+    """
+    Get web safe 216 color palette.
+    >>> colors = _get_websafe_colors()
+    >>> colors.shape, colors[-1]
+    ((216, 3), array([255, 255, 255], dtype=uint8))
+    """
+    levels = np.arange(0, 256, 51)
+    cube = np.stack(np.meshgrid(levels, levels, levels, indexing="ij"), axis=-1)
+    return cube.reshape(-1, 3).astype(np.uint8)
+
+
+WEBSAFE = _get_websafe_colors()
+
+PALETTES = {"xterm256": XTERM256, "ansi16": ANSI16, "websafe": WEBSAFE}
+
+# palettes which terminals support as SGR colors
+TERMINAL_PALETTES = ["xterm256", "ansi16"]
+
+# the first 16 colors of xterm256 are often customized, so they are never chosen.
+_SELECTABLE_COLORS = {
+    "xterm256": slice(16, 256),
+    "ansi16": slice(0, 16),
+    "websafe": slice(0, 216),
+}
+
+
+@lru_cache(maxsize=None)
+def get_color_lut(palette):
+    """
+    Get the lookup table from quantized rgb colors to the nearest palette indices.
+    >>> lut = get_color_lut("xterm256")
+    >>> lut.shape
+    (32, 32, 32)
+    >>> int(lut[31, 0, 0]), int(lut[0, 0, 0])
+    (196, 16)
+    """
+    if palette not in PALETTES:
+        raise ValueError("Unknown palette: {}".format(palette))
+    selectable = _SELECTABLE_COLORS[palette]
+    colors = PALETTES[palette][selectable].astype(np.float32)
+
+    bins = 1 << LUT_BITS
+    centers = (np.arange(bins) << (8 - LUT_BITS)) + (1 << (7 - LUT_BITS))
+    grid = np.stack(np.meshgrid(centers, centers, centers, indexing="ij"), axis=-1)
+    grid = grid.reshape(-1, 3).astype(np.float32)
+    # |c - p|^2 = |c|^2 - 2 c.p + |p|^2, and |c|^2 does not affect argmin over p.
+    distances = (colors**2).sum(axis=-1) - 2.0 * grid.dot(colors.T)
+    lut = (np.argmin(distances, axis=-1) + selectable.start).astype(np.uint8)
+    lut.flags.writeable = False
+    return lut.reshape(bins, bins, bins)
+
+
+def quantize(buffer, palette):
+    """
+    Quantize 3 channel pixels to the indices of the nearest palette colors.
+    >>> quantize(np.array([[[255, 0, 0], [250, 250, 250]]], dtype=np.uint8), "ansi16")
+    array([[ 9, 15]], dtype=uint8)
+    """
+    lut = get_color_lut(palette)
+    shift = 8 - LUT_BITS
+    return lut[
+        buffer[..., 0] >> shift, buffer[..., 1] >> shift, buffer[..., 2] >> shift
+    ]
+
+
+def convert_to_colors(buffer, palette):
+    """
+    Convert 3 channel pixels to rgb values or indices of palette colors.
+    >>> convert_to_colors(np.array([[[255, 0, 0]]], dtype=np.uint8), "truecolor")
+    array([[[255,   0,   0]]], dtype=int16)
+    >>> convert_to_colors(np.array([[[255, 0, 0]]], dtype=np.uint8), "xterm256")
+    array([[196]], dtype=int16)
+    """
+    if palette == "truecolor":
+        return buffer.astype(np.int16)
+    return quantize(buffer, palette).astype(np.int16)
@@ -0,0 +1,189 @@
+from collections import namedtuple
+
+import numpy as np
+
+ByteTable = namedtuple("ByteTable", "data valid")
+
+
+def make_byte_table(items):
+    """
+    Make a table of byte strings whose rows are zero padded to multiples of 8 bytes.
+    >>> table = make_byte_table(["a", "bcd", ""])
+    >>> table.data[:, :4]
+    array([[ 97,   0,   0,   0],
+           [ 98,  99, 100,   0],
+           [  0,   0,   0,   0]], dtype=uint8)
+    >>> table.valid.sum(axis=1)
+    array([1, 3, 0])
+    """
+    encoded = [item.encode("utf-8") for item in items]
+    width = max([1, *[len(e) for e in encoded]])
+    width += -width % 8
+    data = np.zeros((len(encoded), width), dtype=np.uint8)
+    for i, e in enumerate(encoded):
+        data[i, : len(e)] = np.frombuffer(e, dtype=np.uint8)
+    lengths = np.array([len(e) for e in encoded])
+    valid = np.arange(width) < lengths[:, np.newaxis]
+    return ByteTable(data, valid)
+
+
+def pack_byte_fields(fields):
+    """
+    Concatenate byte fields of all items into one bytes without python loops over items.
+    Each field is a tuple of byte table and row indices per item.
+    >>> digits = make_byte_table([str(i) for i in range(256)])
+    >>> comma = make_byte_table([",", ""])
+    >>> pack_byte_fields([(digits, np.array([7, 255, 42])), (comma, np.array([0, 0, 1]))])
+    b'7,255,42'
+    """
+    fields = [(table, np.ravel(indices)) for table, indices in fields]
+    if len(fields) == 0 or len(fields[0][1]) == 0:
+        return b""
+
+    # gather rows as 64bit words, which is much faster than gathering short byte rows
+    words = np.concatenate(
+        [
+            np.take(table.data.view(np.uint64), indices, axis=0)
+            for table, indices in fields
+        ],
+        axis=1,
+    )
+    valid = np.concatenate(
+        [
+            np.take(table.valid.view(np.uint64), indices, axis=0)
+            for table, indices in fields
+        ],
+        axis=1,
+    )
+    return words.view(np.uint8)[valid.view(np.bool_)].tobytes()
+
+
+def count_field_bytes(fields):
+    """
+    Count bytes which byte fields produce.
+    >>> digits = make_byte_table([str(i) for i in range(256)])
+    >>> count_field_bytes([(digits, np.array([7, 255, 42]))])
+    6
+    """
+    return int(sum(table.valid.sum(axis=1)[indices].sum() for table, indices in fields))
+
+
+ABSENT = 256
+
+
+_TRUECOLOR_HEADS = {
+    ground: make_byte_table(
+        ["\x1b[{};2;{};".format(ground, i) for i in range(256)] + [""]
+    )
+    for ground in (38, 48)
+}
+_DECIMALS_WITH_SEMICOLON = make_byte_table(["{};".format(i) for i in range(256)] + [""])
+_DECIMALS_WITH_M = make_byte_table(["{}m".format(i) for i in range(256)] + [""])
+
+
+def truecolor_fields(colors, ground):
+    """
+    Get byte fields of 24bit color SGR sequences.
+    Colors whose channels are ABSENT produce no bytes.
+    >>> colors = np.array([[1, 22, 255], [ABSENT, ABSENT, ABSENT]])
+    >>> pack_byte_fields(truecolor_fields(colors, 38))
+    b'\\x1b[38;2;1;22;255m'
+    """
+    colors = colors.reshape(-1, 3)
+    return [
+        (_TRUECOLOR_HEADS[ground], colors[:, 0]),
+        (_DECIMALS_WITH_SEMICOLON, colors[:, 1]),
+        (_DECIMALS_WITH_M, colors[:, 2]),
+    ]
+
+
+_INDEXED_COLOR_TABLES = {
+    "xterm256": {
+        ground: make_byte_table(
+            ["\x1b[{};5;{}m".format(ground, i) for i in range(256)] + [""]
+        )
+        for ground in (38, 48)
+    },
+    "ansi16": {
+        ground: make_byte_table(
+            ["\x1b[{}m".format(ground - 8 + i) for i in range(8)]
+            + ["\x1b[{}m".format(ground + 52 + i) for i in range(8)]
+            + [""] * (ABSENT - 15)
+        )
+        for ground in (38, 48)
+    },
+}
+
+
+def color_fields(colors, ground, palette="truecolor"):
+    """
+    Get byte fields of color SGR sequences.
+    Colors are rgb values for truecolor, otherwise indices of the palette.
+    >>> pack_byte_fields(color_fields(np.array([[1, 22, 255]]), 48))
+    b'\\x1b[48;2;1;22;255m'
+    >>> pack_byte_fields(color_fields(np.array([196, ABSENT]), 38, "xterm256"))
+    b'\\x1b[38;5;196m'
+    >>> pack_byte_fields(color_fields(np.array([1, 9]), 48, "ansi16"))
+    b'\\x1b[41m\\x1b[101m'
+    """
+    if palette == "truecolor":
+        return truecolor_fields(colors, ground)
+    if palette not in _INDEXED_COLOR_TABLES:
+        raise ValueError("Unknown palette: {}".format(palette))
+    return [(_INDEXED_COLOR_TABLES[palette][ground], np.ravel(colors))]
+
+
+# glyph indices of cells and their colors, which are None if they are not drawn
+Cells = namedtuple("Cells", "glyphs fg bg")
+
+
+def cell_fields(cells, glyph_table, palette="truecolor"):
+    """
+    Get byte fields of cells which set bg and fg colors before the glyph.
+    >>> cells = Cells(np.array([0, 0]), np.array([[1, 2, 3], [ABSENT] * 3]), None)
+    >>> pack_byte_fields(cell_fields(cells, make_byte_table(["x"])))
+    b'\\x1b[38;2;1;2;3mxx'
+    """
+    fields = []
+    if cells.bg is not None:
+        fields += color_fields(cells.bg, 48, palette)
+    if cells.fg is not None:
+        fields += color_fields(cells.fg, 38, palette)
+    fields.append((glyph_table, cells.glyphs))
+    return fields
+
+
+def elide_repeated_colors(colors):
+    """
+    Replace colors which are the same as the previous cell in the line with ABSENT.
+    >>> colors = np.array([[[1, 2, 3], [1, 2, 3], [4, 5, 6]], [[4, 5, 6], [4, 5, 6], [4, 5, 6]]])
+    >>> elide_repeated_colors(colors)[..., 0]
+    array([[  1, 256,   4],
+           [  4, 256, 256]], dtype=int16)
+    """
+    elided = np.array(colors, dtype=np.int16)
+    repeated = elided[:, 1:] == elided[:, :-1]
+    if repeated.ndim == 3:
+        repeated = repeated.all(axis=-1)
+    elided[:, 1:][repeated] = ABSENT
+    return elided
+
+
+def constant_field(item, count):
+    """
+    Get byte field which produces the same string for all items.
+    >>> pack_byte_fields([constant_field("ab", 2)])
+    b'abab'
+    """
+    return make_byte_table([item]), np.zeros(count, dtype=np.intp)
+
+
+def eol_field(shape, eol="\x1b[0m\n"):
+    """
+    Get byte field which puts eol at the end of all lines but the last one.
+    >>> pack_byte_fields([constant_field("a", 4), eol_field((2, 2), "|")])
+    b'aa|aa'
+    """
+    indices = np.ones(shape, dtype=np.intp)
+    indices[:-1, -1] = 0
+    return make_byte_table([eol, ""]), indices
@@ -1,28 +1,745 @@
-from io import StringIO, BytesIO
-from PIL import Image
+import math
+import os
+from ctypes import c_char, memmove
+from functools import lru_cache
 import numpy as np
 
 from .. import libsixel
 from .base import DrawerBase
+from . import sixel_encoder
+from ..shape import ShapeByPixels
+from .palette import PALETTES, quantize
+from .terminal import get_cell_pixels, get_terminal_geometry
+from .normalize import as_channel_last, fit
+from .util import decimate, get_resized_shape, pad_to_multiple_of_shape, resize
 
+# nominal cell size of sixel terminals in pixels, if the terminal does not report it
+CELL_SHAPE = (16, 8)
 
-class SixelDrawer(DrawerBase):
-    def draw(self, buffer, shape=None, preserve_aspect_ratio=True):
-        if buffer.dtype not in [np.uint8]:
-            raise ValueError("BlockDrawer only supports np.uin8.")
-
-        height, width = buffer.shape[0], buffer.shape[1]
-        bytes = buffer.tobytes()
-        if len(buffer.shape) == 3:
-            dither = libsixel.sixel_dither_new(256)
-            libsixel.sixel_dither_initialize(
-                dither, bytes, width, height, libsixel.SIXEL_PIXELFORMAT_RGB888
+HISTOGRAM_BITS = 3
+
+_SAVE_CURSOR = b"\x1b7"
+_RESTORE_CURSOR = b"\x1b8"
+_ERASE_BELOW = b"\x1b[J"
+
+ENCODERS = ["auto", "libsixel", "numpy"]
+
+
+@lru_cache(maxsize=None)
+def _has_libsixel():
+    return libsixel.is_loadable()
+
+
+def _get_encoder(encoder, workers=1):
+    """
+    Get the available encoder, which prefers libsixel to numpy when encoder is 'auto'.
+    Only the numpy encoder encodes with multiple workers.
+    >>> _get_encoder("numpy")
+    'numpy'
+    >>> _get_encoder("auto", workers=4)
+    'numpy'
+    """
+    if encoder not in ENCODERS:
+        raise ValueError("Unknown encoder: {}".format(encoder))
+    if encoder == "auto":
+        return "libsixel" if workers == 1 and _has_libsixel() else "numpy"
+    return encoder
+
+
+def _get_color_histogram(buffer, max_samples=4096):
+    """
+    Get the normalized coarse color histogram of sampled pixels.
+    >>> histogram = _get_color_histogram(np.zeros((4, 4, 3), dtype=np.uint8))
+    >>> histogram.shape, float(histogram[0])
+    ((512,), 1.0)
+    """
+    pixels = buffer.reshape(-1, buffer.shape[2] if buffer.ndim == 3 else 1)
+    pixels = pixels[:: max(1, len(pixels) // max_samples)]
+    if pixels.shape[1] == 1:
+        pixels = np.repeat(pixels, 3, axis=1)
+
+    shift = 8 - HISTOGRAM_BITS
+    bins = pixels[:, :3] >> shift
+    indices = (bins[:, 0].astype(np.intp) << (2 * HISTOGRAM_BITS)) | (
+        (bins[:, 1].astype(np.intp) << HISTOGRAM_BITS) | bins[:, 2]
+    )
+    histogram = np.bincount(indices, minlength=1 << (3 * HISTOGRAM_BITS))
+    return histogram / len(pixels)
+
+
+def _get_color_drift(histogram, other):
+    """
+    Get the fraction of pixels whose colors moved between two histograms.
+    >>> black = _get_color_histogram(np.zeros((4, 4, 3), dtype=np.uint8))
+    >>> white = _get_color_histogram(np.full((4, 4, 3), 255, dtype=np.uint8))
+    >>> float(_get_color_drift(black, black)), float(_get_color_drift(black, white))
+    (0.0, 1.0)
+    """
+    return 0.5 * np.abs(histogram - other).sum()
+
+
+def _new_dither(buffer, colors=None):
+    height, width = buffer.shape[0], buffer.shape[1]
+    if colors is not None:
+        # indexed pixels skip building palette from histogram
+        dither = libsixel.sixel_dither_new(len(colors))
+        libsixel.sixel_dither_set_palette(dither, colors.tobytes())
+        libsixel.sixel_dither_set_pixelformat(dither, libsixel.SIXEL_PIXELFORMAT_PAL8)
+    elif len(buffer.shape) == 3:
+        dither = libsixel.sixel_dither_new(256)
+        libsixel.sixel_dither_initialize(
+            dither, buffer.tobytes(), width, height, libsixel.SIXEL_PIXELFORMAT_RGB888
+        )
+    else:
+        dither = libsixel.sixel_dither_get(libsixel.SIXEL_BUILTIN_G8)
+        libsixel.sixel_dither_set_pixelformat(dither, libsixel.SIXEL_PIXELFORMAT_G8)
+    return dither
+
+
+def _encode(buffer, dither, output):
+    height, width = buffer.shape[0], buffer.shape[1]
+    libsixel.sixel_encode(buffer.tobytes(), width, height, 1, dither, output)
+
+
+def _get_resized_shape(
+    buffer, shape, preserve_aspect_ratio, shrink_to_terminal, geometry=None
+):
+    if shape is None:
+        shape = ShapeByPixels(buffer.shape[0], buffer.shape[1])
+    # the terminal is queried once for both the cell size and the terminal size
+    if geometry is None:
+        geometry = get_terminal_geometry()
+    return get_resized_shape(
+        buffer,
+        shape,
+        get_cell_pixels(CELL_SHAPE, geometry),
+        preserve_aspect_ratio,
+        shrink_to_terminal,
+        geometry,
+    )
+
+
+def _resize_to_display(
+    buffer,
+    shape,
+    preserve_aspect_ratio,
+    shrink_to_terminal,
+    window=None,
+    background=(0, 0, 0),
+    geometry=None,
+):
+    """
+    Resize to displaying image size and convert to uint8 before dithering.
+    >>> buffer = np.zeros((1200, 1800, 4), dtype=np.uint16)
+    >>> _resize_to_display(buffer, ShapeByPixels(60, 60), True, False).shape
+    (40, 60, 3)
+    """
+    buffer = as_channel_last(buffer)
+    resized_shape = _get_resized_shape(
+        buffer, shape, preserve_aspect_ratio, shrink_to_terminal, geometry
+    )
+    return fit(buffer, resized_shape, "bicubic", window, background)
+
+
+def _check_indices(buffer, palette):
+    """
+    Check the index array and the palette, and convert them to uint8.
+    >>> _check_indices(np.array([[0, 1]]), [[0, 0, 0], [255, 255, 255]])[0]
+    array([[0, 1]], dtype=uint8)
+    >>> _check_indices(np.array([[0, 1]]), [[0.0, 0.0, 0.0], [1.0, 1.0, 1.0]])
+    Traceback (most recent call last):
+    ...
+    ValueError: Palette must be integer colors.
+    """
+    colors = np.asarray(palette)
+    if colors.dtype.kind not in "ui":
+        raise ValueError("Palette must be integer colors.")
+    if 0 < colors.size and (colors.min() < 0 or 255 < colors.max()):
+        raise ValueError("Palette must have colors in 0 to 255.")
+    colors = colors.astype(np.uint8).reshape(-1, 3)
+    if not 0 < len(colors) <= 256:
+        raise ValueError("Palette must have 1 to 256 colors.")
+    if buffer.ndim != 2 or buffer.dtype.kind not in "ui":
+        raise ValueError("Indexed buffer must be 2 dimensional integer array.")
+    if buffer.min() < 0 or len(colors) <= buffer.max():
+        raise ValueError("Indexed buffer has indices out of the palette.")
+    return buffer.astype(np.uint8), colors
+
+
+def _get_display_pixels(
+    buffer,
+    shape,
+    preserve_aspect_ratio,
+    shrink_to_terminal,
+    palette,
+    window=None,
+    background=(0, 0, 0),
+    geometry=None,
+):
+    """
+    Get resized pixels and colors of the palette, which is None for median cut.
+    palette is a name of builtin palettes, or colors of which buffer has indices.
+    geometry of the terminal is queried once if it is not given.
+    >>> buffer = np.array([[[255, 0, 0], [0, 0, 0]]], dtype=np.uint8)
+    >>> pixels, colors = _get_display_pixels(buffer, None, True, False, "websafe")
+    >>> pixels, len(colors)
+    (array([[180,   0]], dtype=uint8), 216)
+    """
+    if not isinstance(palette, str) and palette is not None:
+        resized_shape = _get_resized_shape(
+            buffer, shape, preserve_aspect_ratio, shrink_to_terminal, geometry
+        )
+        # only the indices which are drawn are checked
+        buffer, colors = _check_indices(decimate(buffer, resized_shape), palette)
+        return resize(buffer, resized_shape, "nearest"), colors
+
+    if palette is not None and palette not in PALETTES:
+        raise ValueError("Unknown palette: {}".format(palette))
+    buffer = _resize_to_display(
+        buffer,
+        shape,
+        preserve_aspect_ratio,
+        shrink_to_terminal,
+        window,
+        background,
+        geometry,
+    )
+    if palette is None:
+        return buffer, None
+    if buffer.ndim == 2:
+        buffer = np.broadcast_to(buffer[..., np.newaxis], (*buffer.shape, 3))
+    return quantize(buffer, palette), PALETTES[palette]
+
+
+def _encode_with_numpy(pixels, colors, workers=1):
+    if colors is None:
+        return sixel_encoder.encode(pixels, workers)
+    return sixel_encoder.encode_indexed(pixels, colors, workers)
+
+
+class _BytearraySink:
+    """
+    Sink which copies written packets into one growing bytearray.
+    >>> sink = _BytearraySink(capacity=2)
+    >>> sink.write_bytes(b"abc")
+    >>> sink.write_bytes(b"de")
+    >>> sink.getvalue()
+    b'abcde'
+    """
+
+    def __init__(self, capacity=4 * libsixel.SIXEL_OUTPUT_PACKET_SIZE):
+        self.size = 0
+        self._buffer = bytearray(capacity)
+
+    def write(self, address, size):
+        end = self.size + size
+        if len(self._buffer) < end:
+            self._buffer.extend(
+                bytes(max(end, 2 * len(self._buffer)) - len(self._buffer))
             )
-        else:
-            dither = libsixel.sixel_dither_get(libsixel.SIXEL_BUILTIN_G8)
-            libsixel.sixel_dither_set_pixelformat(dither, libsixel.SIXEL_PIXELFORMAT_G8)
-
-        s = BytesIO()
-        output = libsixel.sixel_output_new(lambda data, s: s.write(data), s)
-        libsixel.sixel_encode(bytes, width, height, 1, dither, output)
-        return s.getvalue().decode("ascii")
+        memmove((c_char * size).from_buffer(self._buffer, self.size), address, size)
+        self.size = end
+
+    def write_bytes(self, data):
+        self.write(data, len(data))
+
+    def getvalue(self):
+        return bytes(memoryview(self._buffer)[: self.size])
+
+    def clear(self):
+        self.size = 0
+
+
+class _StreamSink:
+    """
+    Sink which passes written packets to the binary stream or the file descriptor.
+    >>> from io import BytesIO
+    >>> stream = BytesIO()
+    >>> _StreamSink(stream).write_bytes(b"abc")
+    >>> stream.getvalue()
+    b'abc'
+    """
+
+    def __init__(self, stream):
+        self.stream = stream
+
+    def write(self, address, size):
+        self.write_bytes(memoryview((c_char * size).from_address(address)).cast("B"))
+
+    def write_bytes(self, data):
+        if not isinstance(self.stream, int):
+            self.stream.write(data)
+            return
+
+        data = memoryview(data)
+        while 0 < len(data):
+            data = data[os.write(self.stream, data) :]
+
+
+def _encode_to(sink, buffer, colors=None):
+    dither = _new_dither(buffer, colors)
+    try:
+        output = libsixel.sixel_output_new_raw(sink.write)
+        try:
+            _encode(buffer, dither, output)
+        finally:
+            libsixel.sixel_output_unref(output)
+    finally:
+        libsixel.sixel_dither_unref(dither)
+
+
+class SixelSession:
+    """
+    Session which reuses the sixel palette, the dither and the output over frames.
+    The palette is rebuilt only when the color drift from the frame which the palette
+    was built from exceeds drift_threshold. 1.0 freezes the palette of the first frame.
+    Native resources are released by close() or at the end of with statement.
+    The numpy encoder always uses the fixed palette, so it has nothing to reuse.
+    """
+
+    def __init__(self, drift_threshold=0.1, encoder="auto"):
+        self.drift_threshold = drift_threshold
+        self.encoder = _get_encoder(encoder)
+        self.palette_builds = 0
+        self._closed = False
+        self._dither = None
+        self._histogram = None
+        self._ndim = None
+        self._buffer_sink = _BytearraySink()
+        self._sink = self._buffer_sink
+        self._output = None
+        if self.encoder == "libsixel":
+            self._output = libsixel.sixel_output_new_raw(self._write)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def close(self):
+        self._closed = True
+        self._release_dither()
+        if self._output is not None:
+            libsixel.sixel_output_unref(self._output)
+            self._output = None
+
+    def _write(self, address, size):
+        self._sink.write(address, size)
+
+    def _release_dither(self):
+        if self._dither is not None:
+            libsixel.sixel_dither_unref(self._dither)
+            self._dither = None
+
+    def _prepare_dither(self, buffer):
+        if buffer.ndim != self._ndim:
+            self._release_dither()
+            self._ndim = buffer.ndim
+        if buffer.ndim != 3:
+            if self._dither is None:
+                self._dither = _new_dither(buffer)
+            return
+
+        histogram = _get_color_histogram(buffer)
+        if self._dither is None or self.drift_threshold < _get_color_drift(
+            self._histogram, histogram
+        ):
+            self._release_dither()
+            self._dither = _new_dither(buffer)
+            self._histogram = histogram
+            self.palette_builds += 1
+
+    def _draw_to_sink(
+        self,
+        sink,
+        buffer,
+        shape,
+        preserve_aspect_ratio,
+        shrink_to_terminal,
+        palette,
+        window,
+        background,
+    ):
+        if self._closed:
+            raise ValueError("SixelSession is already closed.")
+
+        pixels, colors = _get_display_pixels(
+            buffer,
+            shape,
+            preserve_aspect_ratio,
+            shrink_to_terminal,
+            palette,
+            window,
+            background,
+        )
+        if self.encoder == "numpy":
+            sink.write_bytes(_encode_with_numpy(pixels, colors))
+            return
+
+        self._sink = sink
+        try:
+            if colors is None:
+                self._prepare_dither(pixels)
+                _encode(pixels, self._dither, self._output)
+                return
+
+            dither = _new_dither(pixels, colors)
+            try:
+                _encode(pixels, dither, self._output)
+            finally:
+                libsixel.sixel_dither_unref(dither)
+        finally:
+            self._sink = self._buffer_sink
+
+    def draw(
+        self,
+        buffer,
+        shape=None,
+        preserve_aspect_ratio=True,
+        shrink_to_terminal=True,
+        palette=None,
+        window=None,
+        background=(0, 0, 0),
+    ):
+        return self.draw_bytes(
+            buffer,
+            shape,
+            preserve_aspect_ratio,
+            shrink_to_terminal,
+            palette,
+            window,
+            background,
+        ).decode("ascii")
+
+    def draw_bytes(
+        self,
+        buffer,
+        shape=None,
+        preserve_aspect_ratio=True,
+        shrink_to_terminal=True,
+        palette=None,
+        window=None,
+        background=(0, 0, 0),
+    ):
+        self._buffer_sink.clear()
+        self._draw_to_sink(
+            self._buffer_sink,
+            buffer,
+            shape,
+            preserve_aspect_ratio,
+            shrink_to_terminal,
+            palette,
+            window,
+            background,
+        )
+        return self._buffer_sink.getvalue()
+
+    def draw_to(
+        self,
+        stream,
+        buffer,
+        shape=None,
+        preserve_aspect_ratio=True,
+        shrink_to_terminal=True,
+        palette=None,
+        window=None,
+        background=(0, 0, 0),
+    ):
+        self._draw_to_sink(
+            _StreamSink(stream),
+            buffer,
+            shape,
+            preserve_aspect_ratio,
+            shrink_to_terminal,
+            palette,
+            window,
+            background,
+        )
+
+
+class SixelDrawer(DrawerBase):
+    """
+    Drawer of sixel graphics.
+    palette of draw methods fixes the sixel palette instead of median cut.
+    It is a name of builtin palettes, 'xterm256', 'ansi16' or 'websafe',
+    or colors of the palette when buffer is an array of the indices.
+    The numpy encoder splits bands of the image into groups which are encoded by
+    workers threads, and 'auto' chooses it if workers is greater than 1.
+    libsixel encodes serially, because its error diffusion would restart at each
+    group and leave seams.
+    """
+
+    def __init__(self, encoder="auto", workers=1):
+        if encoder not in ENCODERS:
+            raise ValueError("Unknown encoder: {}".format(encoder))
+        if workers < 1:
+            raise ValueError("workers must be positive.")
+        if encoder == "libsixel" and 1 < workers:
+            raise ValueError("libsixel encoder does not support multiple workers.")
+        self.encoder = encoder
+        self.workers = workers
+
+    def session(self, drift_threshold=0.1):
+        return SixelSession(drift_threshold, self.encoder)
+
+    def draw(
+        self,
+        buffer,
+        shape=None,
+        preserve_aspect_ratio=True,
+        shrink_to_terminal=True,
+        palette=None,
+        window=None,
+        background=(0, 0, 0),
+    ):
+        return self.draw_bytes(
+            buffer,
+            shape,
+            preserve_aspect_ratio,
+            shrink_to_terminal,
+            palette,
+            window,
+            background,
+        ).decode("ascii")
+
+    def draw_bytes(
+        self,
+        buffer,
+        shape=None,
+        preserve_aspect_ratio=True,
+        shrink_to_terminal=True,
+        palette=None,
+        window=None,
+        background=(0, 0, 0),
+    ):
+        pixels, colors = _get_display_pixels(
+            buffer,
+            shape,
+            preserve_aspect_ratio,
+            shrink_to_terminal,
+            palette,
+            window,
+            background,
+        )
+        if _get_encoder(self.encoder, self.workers) == "numpy":
+            return _encode_with_numpy(pixels, colors, self.workers)
+
+        sink = _BytearraySink()
+        _encode_to(sink, pixels, colors)
+        return sink.getvalue()
+
+    def draw_to(
+        self,
+        stream,
+        buffer,
+        shape=None,
+        preserve_aspect_ratio=True,
+        shrink_to_terminal=True,
+        palette=None,
+        window=None,
+        background=(0, 0, 0),
+    ):
+        """
+        Draw to the binary stream, or the file descriptor if stream is int.
+        Packets of libsixel are passed through without copying into python bytes.
+        """
+        pixels, colors = _get_display_pixels(
+            buffer,
+            shape,
+            preserve_aspect_ratio,
+            shrink_to_terminal,
+            palette,
+            window,
+            background,
+        )
+        sink = _StreamSink(stream)
+        if _get_encoder(self.encoder, self.workers) == "numpy":
+            sink.write_bytes(_encode_with_numpy(pixels, colors, self.workers))
+            return
+
+        _encode_to(sink, pixels, colors)
+
+
+def get_tile_shape(cell_shape, columns=8):
+    """
+    Get the pixel shape of tiles which are aligned to both cells and sixel bands.
+    >>> get_tile_shape((16, 8))
+    (48, 64)
+    """
+    cell_height, cell_width = cell_shape
+    band = sixel_encoder.BAND_HEIGHT
+    return (band * cell_height // math.gcd(band, cell_height), cell_width * columns)
+
+
+def get_changed_tiles(indices, previous, tile_shape):
+    """
+    Get the mask of tiles which have any changed pixel.
+    >>> previous = np.zeros((8, 10), dtype=np.uint8)
+    >>> indices = previous.copy()
+    >>> indices[7, 9] = 1
+    >>> get_changed_tiles(indices, previous, (6, 4))
+    array([[False, False, False],
+           [False, False,  True]])
+    """
+    changed = pad_to_multiple_of_shape(indices != previous, tile_shape)
+    rows, cols = changed.shape[0] // tile_shape[0], changed.shape[1] // tile_shape[1]
+    return changed.reshape(rows, tile_shape[0], cols, tile_shape[1]).any(axis=(1, 3))
+
+
+def _get_tile_runs(tiles):
+    """
+    Get horizontal runs of changed tiles as (row, first column, columns).
+    >>> _get_tile_runs(np.array([[True, True, False, True], [False, True, True, True]]))
+    [(0, 0, 2), (0, 3, 1), (1, 1, 3)]
+    """
+    padded = np.zeros((tiles.shape[0], tiles.shape[1] + 2), dtype=np.int8)
+    padded[:, 1:-1] = tiles
+    edges = np.diff(padded, axis=1)
+    starts, ends = np.nonzero(edges == 1), np.nonzero(edges == -1)
+    return [
+        (int(row), int(first), int(last - first))
+        for row, first, last in zip(starts[0], starts[1], ends[1])
+    ]
+
+
+def _move_cursor(lines, columns):
+    moves = b""
+    if 0 < lines:
+        moves += "\x1b[{}B".format(lines).encode("ascii")
+    if 0 < columns:
+        moves += "\x1b[{}C".format(columns).encode("ascii")
+    return moves
+
+
+class SixelDeltaRenderer:
+    """
+    Renderer which redraws only tiles of the sixel frame changed from the previous one.
+    Frames are quantized to the fixed palette shared by all frames and tiles, so
+    changes are found by comparing indices. Tiles are aligned to cells and sixel
+    bands by get_tile_shape, and changed tiles in a row are encoded together as one
+    image, which is placed by cursor moves from the top left of the frame saved by
+    DECSC. Frames are redrawn fully if the fraction of changed tiles exceeds
+    threshold, or the shape of the frame or the palette is changed.
+    Rendered frames leave the cursor at the head of the line below the frame.
+    >>> from .terminal import reset_terminal_geometry, set_terminal_geometry
+    >>> set_terminal_geometry(24, 80)
+    >>> renderer = SixelDeltaRenderer("websafe")
+    >>> buffer = np.zeros((48, 128, 3), dtype=np.uint8)
+    >>> full = renderer.render(buffer, shrink_to_terminal=False)
+    >>> buffer[40, 100] = 255
+    >>> renderer.render(buffer, shrink_to_terminal=False)[:25]
+    '\\x1b8\\x1b[8C\\x1bP7;1;75q"1;1;64;48'
+    >>> renderer.render(buffer, shrink_to_terminal=False)
+    ''
+    >>> renderer.full_redraws, renderer.changed_fraction
+    (1, 0.0)
+    >>> reset_terminal_geometry()
+    """
+
+    def __init__(self, palette="xterm256", threshold=0.5, tile_columns=8):
+        if palette is None:
+            raise ValueError("Palette must be fixed to be shared by tiles.")
+        if tile_columns < 1:
+            raise ValueError("tile_columns must be positive.")
+        self.palette = palette
+        self.threshold = threshold
+        self.tile_columns = tile_columns
+        self.full_redraws = 0
+        self.changed_fraction = 1.0
+        self._indices = None
+        self._colors = None
+        self._cell_shape = None
+
+    def reset(self):
+        """
+        Forget the previous frame, so the next frame is drawn at the cursor fully.
+        """
+        self._indices = None
+
+    def _render_full(self, indices, colors, previous, lines):
+        self.full_redraws += 1
+        prefix = b""
+        if previous is not None:
+            prefix = _RESTORE_CURSOR
+        if previous is None or previous.shape != indices.shape:
+            if previous is not None:
+                prefix += _ERASE_BELOW
+            # scroll the lines of the frame in before saving its top left
+            prefix += b"\n" * lines + "\x1b[{}A".format(lines).encode("ascii")
+            prefix += _SAVE_CURSOR
+        image = sixel_encoder.encode_indexed(indices, colors)
+        return prefix + image + _RESTORE_CURSOR + _move_cursor(lines, 0)
+
+    def render_bytes(
+        self,
+        buffer,
+        shape=None,
+        preserve_aspect_ratio=True,
+        shrink_to_terminal=True,
+        window=None,
+        background=(0, 0, 0),
+    ):
+        geometry = get_terminal_geometry()
+        indices, colors = _get_display_pixels(
+            buffer,
+            shape,
+            preserve_aspect_ratio,
+            shrink_to_terminal,
+            self.palette,
+            window,
+            background,
+            geometry,
+        )
+        cell_shape = get_cell_pixels(CELL_SHAPE, geometry)
+        lines = -(-indices.shape[0] // cell_shape[0])
+
+        previous, self._indices = self._indices, indices
+        previous_colors, self._colors = self._colors, colors
+        previous_cell_shape, self._cell_shape = self._cell_shape, cell_shape
+        if (
+            previous is None
+            or previous.shape != indices.shape
+            or previous_cell_shape != cell_shape
+            or not np.array_equal(previous_colors, colors)
+        ):
+            self.changed_fraction = 1.0
+            return self._render_full(indices, colors, previous, lines)
+
+        tile_shape = get_tile_shape(cell_shape, self.tile_columns)
+        tiles = get_changed_tiles(indices, previous, tile_shape)
+        self.changed_fraction = float(tiles.mean())
+        if self.changed_fraction == 0.0:
+            return b""
+        if self.threshold < self.changed_fraction:
+            return self._render_full(indices, colors, previous, lines)
+
+        tile_height, tile_width = tile_shape
+        tile_lines = tile_height // cell_shape[0]
+        updates = []
+        for row, first, columns in _get_tile_runs(tiles):
+            top, left = row * tile_height, first * tile_width
+            rect = indices[top : top + tile_height, left : left + columns * tile_width]
+            updates.append(_RESTORE_CURSOR)
+            updates.append(_move_cursor(row * tile_lines, first * self.tile_columns))
+            updates.append(sixel_encoder.encode_indexed(rect, colors))
+        updates.append(_RESTORE_CURSOR + _move_cursor(lines, 0))
+        return b"".join(updates)
+
+    def render(
+        self,
+        buffer,
+        shape=None,
+        preserve_aspect_ratio=True,
+        shrink_to_terminal=True,
+        window=None,
+        background=(0, 0, 0),
+    ):
+        return self.render_bytes(
+            buffer,
+            shape,
+            preserve_aspect_ratio,
+            shrink_to_terminal,
+            window,
+            background,
+        ).decode("ascii")
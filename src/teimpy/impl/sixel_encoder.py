@@ -0,0 +1,163 @@
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+
+import numpy as np
+
+from .palette import quantize, XTERM256
+from .sgr import make_byte_table, pack_byte_fields
+
+BAND_HEIGHT = 6
+
+_COLOR_INTRODUCERS = make_byte_table(["#{}".format(i) for i in range(256)] + [""])
+_BAND_TERMINATORS = make_byte_table(["", "$", "-"])
+# sixel characters repeated 0 to 3 times, which are indexed by code * 4 + repeats
+_SIXEL_CHARS = make_byte_table(
+    [chr(0x3F + code) * repeats for code in range(64) for repeats in range(4)]
+)
+GRAY_PALETTE = np.repeat(np.arange(256, dtype=np.uint8), 3).reshape(-1, 3)
+
+
+@lru_cache(maxsize=16)
+def _get_repeat_introducers(width):
+    return make_byte_table(["!{}".format(n) if 3 < n else "" for n in range(width + 1)])
+
+
+def _pack_6x1_pixels_to_sixel_codes(indices, ncolors):
+    """
+    Pack 6x1 pixels of each color into sixel codes per band.
+    Pixels whose index is ncolors, which are used for padding, belong to no color.
+    >>> indices = np.array([[0], [1], [0], [1], [1], [2], [1]])
+    >>> _pack_6x1_pixels_to_sixel_codes(indices, 2)[..., 0]
+    array([[ 5, 26],
+           [ 0,  1]], dtype=uint8)
+    """
+    height, width = indices.shape
+    bands = -(-height // BAND_HEIGHT)
+    padded = np.full((bands * BAND_HEIGHT, width), ncolors, dtype=np.intp)
+    padded[:height] = indices
+    padded = padded.reshape(bands, BAND_HEIGHT, width)
+
+    codes = np.zeros((bands, ncolors + 1, width), dtype=np.uint8)
+    band_ids = np.arange(bands)[:, np.newaxis]
+    cols = np.arange(width)[np.newaxis, :]
+    for row in range(BAND_HEIGHT):
+        # each pixel of the row has just one color, so no indices are duplicated
+        codes[band_ids, padded[:, row], cols] |= 1 << row
+    return codes[:, :ncolors]
+
+
+def _get_run_fields(codes, colors, terminators):
+    """
+    Get byte fields of run length compressed sixel codes of rows.
+    A row is introduced by its color and closed by its terminator.
+    >>> codes = np.array([[1, 1, 1, 1, 0, 2, 0, 0], [63, 0, 0, 0, 0, 0, 0, 0]])
+    >>> pack_byte_fields(_get_run_fields(codes, np.array([0, 1]), np.array([1, 0])))
+    b'#0!4@?A$#1~'
+    """
+    width = codes.shape[1]
+    nonzero = codes[:, ::-1] != 0
+    lengths = np.where(nonzero.any(axis=1), width - np.argmax(nonzero, axis=1), 0)
+    values = codes[np.arange(width) < lengths[:, np.newaxis]]
+    row_ids = np.repeat(np.arange(len(codes)), lengths)
+
+    starts = np.ones(len(values), dtype=np.bool_)
+    starts[1:] = (values[1:] != values[:-1]) | (row_ids[1:] != row_ids[:-1])
+    starts = np.flatnonzero(starts)
+    repeats = np.diff(np.append(starts, len(values)))
+    run_rows = row_ids[starts]
+    firsts = np.ones(len(starts), dtype=np.bool_)
+    firsts[1:] = run_rows[1:] != run_rows[:-1]
+    lasts = np.ones(len(starts), dtype=np.bool_)
+    lasts[:-1] = firsts[1:]
+
+    empty = len(_COLOR_INTRODUCERS.data) - 1
+    return [
+        (_COLOR_INTRODUCERS, np.where(firsts, colors[run_rows], empty)),
+        (_get_repeat_introducers(width), repeats),
+        (_SIXEL_CHARS, 4 * values[starts] + np.where(3 < repeats, 1, repeats)),
+        (_BAND_TERMINATORS, np.where(lasts, terminators[run_rows], 0)),
+    ]
+
+
+def _get_palette_definitions(palette):
+    """
+    Get color definitions of palette in percentages of RGB.
+    >>> _get_palette_definitions(np.array([[255, 0, 128]]))
+    '#0;2;100;0;50'
+    """
+    percentages = (np.asarray(palette, dtype=np.int32) * 200 + 255) // 510
+    return "".join(
+        "#{};2;{};{};{}".format(i, *p) for i, p in enumerate(percentages.tolist())
+    )
+
+
+def get_band_groups(height, groups):
+    """
+    Get row slices which split height into groups of whole 6 pixel bands.
+    >>> get_band_groups(20, 2)
+    [slice(0, 12, None), slice(12, 20, None)]
+    """
+    bands = -(-height // BAND_HEIGHT)
+    step = BAND_HEIGHT * -(-bands // max(1, min(groups, bands)))
+    return [slice(top, min(top + step, height)) for top in range(0, height, step)]
+
+
+def wrap_bodies(bodies, width, height, palette):
+    """
+    Wrap sixel bodies of band groups in one DCS envelope with palette definitions.
+    >>> wrap_bodies([b"#0~", b"#0@"], 1, 7, np.array([[0, 0, 0]]))
+    b'\\x1bP7;1;75q"1;1;1;7#0;2;0;0;0#0~-#0@\\x1b\\\\'
+    """
+    header = '\x1bP7;1;75q"1;1;{};{}'.format(width, height)
+    definitions = _get_palette_definitions(palette)
+    return (header + definitions).encode("ascii") + b"-".join(bodies) + b"\x1b\\"
+
+
+def _encode_body(indices, ncolors):
+    codes = _pack_6x1_pixels_to_sixel_codes(indices, ncolors)
+    bands, colors = np.nonzero(codes.any(axis=2))
+    terminators = np.ones(len(bands), dtype=np.intp)
+    terminators[:-1][bands[1:] != bands[:-1]] = 2
+    terminators[-1] = 0
+    return pack_byte_fields(_get_run_fields(codes[bands, colors], colors, terminators))
+
+
+def encode_indexed(indices, palette, workers=1):
+    """
+    Encode the indexed image to sixel with colors of the palette.
+    Band groups are encoded in parallel if workers is greater than 1.
+    >>> indices = np.array([[0, 1], [1, 1]])
+    >>> encode_indexed(indices, np.array([[0, 0, 0], [255, 255, 255]]))
+    b'\\x1bP7;1;75q"1;1;2;2#0;2;0;0;0#1;2;100;100;100#0@$#1AB\\x1b\\\\'
+    """
+    height, width = indices.shape
+
+    # only the used colors are registered
+    used, indices = np.unique(indices, return_inverse=True)
+    if 256 < len(used):
+        raise ValueError("Sixel supports up to 256 colors.")
+    indices = indices.reshape(height, width)
+
+    groups = get_band_groups(height, workers)
+    if len(groups) == 1:
+        bodies = [_encode_body(indices, len(used))]
+    else:
+        with ThreadPoolExecutor(workers) as executor:
+            bodies = list(
+                executor.map(
+                    lambda rows: _encode_body(indices[rows], len(used)), groups
+                )
+            )
+    return wrap_bodies(bodies, width, height, np.asarray(palette)[used])
+
+
+def encode(buffer, workers=1):
+    """
+    Encode grayscale or RGB pixels to sixel without libsixel.
+    RGB pixels are quantized to xterm 256 colors.
+    >>> encode(np.array([[0]], dtype=np.uint8))
+    b'\\x1bP7;1;75q"1;1;1;1#0;2;0;0;0#0@\\x1b\\\\'
+    """
+    if buffer.ndim == 3:
+        return encode_indexed(quantize(buffer, "xterm256"), XTERM256, workers)
+    return encode_indexed(buffer, GRAY_PALETTE, workers)
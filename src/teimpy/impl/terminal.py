@@ -0,0 +1,182 @@
+import os
+import signal
+import struct
+import sys
+import threading
+from collections import namedtuple
+from shutil import get_terminal_size
+
+try:
+    import fcntl
+    import termios
+except ImportError:  # pragma: no cover
+    fcntl = None
+    termios = None
+
+# pixel height and width are 0 if the terminal does not report them
+TerminalGeometry = namedtuple("TerminalGeometry", "rows cols height width")
+
+_geometry = None
+_generation = 0
+_override = None
+_handler = None
+_previous_handler = None
+_lock = threading.Lock()
+
+
+def _query_winsize():
+    if fcntl is None:
+        return (0, 0, 0, 0)
+    for stream in (sys.__stdout__, sys.__stdin__, sys.__stderr__):
+        try:
+            packed = fcntl.ioctl(
+                stream.fileno(), termios.TIOCGWINSZ, struct.pack("HHHH", 0, 0, 0, 0)
+            )
+        except (AttributeError, ValueError, OSError):
+            continue
+        return struct.unpack("HHHH", packed)
+    return (0, 0, 0, 0)
+
+
+def query_terminal_geometry():
+    """
+    Query the terminal size in cells and pixels without the cache.
+    Cells and pixels are taken from one TIOCGWINSZ ioctl, and get_terminal_size
+    is used only if it fails or COLUMNS or LINES is set.
+    >>> geometry = query_terminal_geometry()
+    >>> 0 < geometry.rows and 0 < geometry.cols
+    True
+    """
+    rows, cols, width, height = _query_winsize()
+    if 0 in (rows, cols) or "COLUMNS" in os.environ or "LINES" in os.environ:
+        cols, rows = get_terminal_size()
+    return TerminalGeometry(rows, cols, height, width)
+
+
+def invalidate_terminal_geometry(*args):
+    """
+    Drop the cached terminal geometry, which is called on SIGWINCH.
+    """
+    global _geometry, _generation
+    _generation += 1
+    _geometry = None
+
+
+def _on_sigwinch(signum, frame):
+    invalidate_terminal_geometry()
+    if callable(_previous_handler):
+        _previous_handler(signum, frame)
+
+
+def _is_cache_enabled():
+    # the cache may be stale once another handler replaces ours
+    return _handler is not None and signal.getsignal(signal.SIGWINCH) is _handler
+
+
+def enable_geometry_cache():
+    """
+    Cache the terminal geometry until the terminal is resized.
+    It installs the SIGWINCH handler which calls the previous one, so it must be
+    called in the main thread. The cache is bypassed if another handler replaces it.
+    Returns False if resizes cannot be noticed, and the geometry is queried every time.
+    >>> enable_geometry_cache()
+    True
+    >>> get_terminal_geometry() is get_terminal_geometry()
+    True
+    >>> disable_geometry_cache()
+    """
+    global _handler, _previous_handler
+    if _is_cache_enabled():
+        return True
+    if not hasattr(signal, "SIGWINCH"):
+        return False
+
+    previous = signal.getsignal(signal.SIGWINCH)
+    try:
+        signal.signal(signal.SIGWINCH, _on_sigwinch)
+    except ValueError:
+        # signal handlers can be set only in the main thread
+        return False
+    invalidate_terminal_geometry()
+    _handler, _previous_handler = _on_sigwinch, previous
+    return True
+
+
+def disable_geometry_cache():
+    """
+    Stop caching the terminal geometry, and restore the previous SIGWINCH handler.
+    """
+    global _handler, _previous_handler
+    if _is_cache_enabled():
+        # None means the handler was not installed from python
+        previous = signal.SIG_DFL if _previous_handler is None else _previous_handler
+        signal.signal(signal.SIGWINCH, previous)
+    _handler, _previous_handler = None, None
+    invalidate_terminal_geometry()
+
+
+def set_terminal_geometry(rows, cols, height=0, width=0):
+    """
+    Override the terminal geometry, which is useful for sinks other than tty.
+    >>> set_terminal_geometry(24, 80, 480, 800)
+    >>> get_terminal_geometry()
+    TerminalGeometry(rows=24, cols=80, height=480, width=800)
+    >>> reset_terminal_geometry()
+    """
+    global _override
+    _override = TerminalGeometry(rows, cols, height, width)
+
+
+def reset_terminal_geometry():
+    """
+    Stop overriding the terminal geometry.
+    """
+    global _override
+    _override = None
+    invalidate_terminal_geometry()
+
+
+def get_terminal_geometry():
+    """
+    Get the terminal geometry, which is queried every time unless
+    enable_geometry_cache is called.
+    >>> set_terminal_geometry(24, 80)
+    >>> get_terminal_geometry()
+    TerminalGeometry(rows=24, cols=80, height=0, width=0)
+    >>> reset_terminal_geometry()
+    """
+    global _geometry
+    override, geometry = _override, _geometry
+    if override is not None:
+        return override
+    if not _is_cache_enabled():
+        return query_terminal_geometry()
+    if geometry is not None:
+        return geometry
+
+    with _lock:
+        generation = _generation
+        geometry = query_terminal_geometry()
+        # a resize during the query makes the result stale
+        if generation == _generation:
+            _geometry = geometry
+    return geometry
+
+
+def get_cell_pixels(default, geometry=None):
+    """
+    Get the pixel size of a cell, or default if the terminal does not report it.
+    geometry is queried by get_terminal_geometry if it is not given.
+    >>> set_terminal_geometry(24, 80, 480, 800)
+    >>> get_cell_pixels((16, 8))
+    (20, 10)
+    >>> set_terminal_geometry(24, 80)
+    >>> get_cell_pixels((16, 8))
+    (16, 8)
+    >>> reset_terminal_geometry()
+    """
+    if geometry is None:
+        geometry = get_terminal_geometry()
+    if 0 in geometry:
+        return default
+    return (geometry.height // geometry.rows, geometry.width // geometry.cols)
@@ -1,10 +1,9 @@
-from shutil import get_terminal_size
-
 import numpy as np
 from PIL import Image
 
 
 from ..shape import ShapeByCells, ShapeByRatio, ShapeByPixels
+from .terminal import get_terminal_geometry
 
 
 def convert_to_str(buffer, eol_char="\n"):
@@ -12,9 +11,21 @@ def convert_to_str(buffer, eol_char="\n"):
     Convert character code matrix to str.
     >>> convert_to_str(np.array([[97, 98],[99, 100]]))
     'ab\\ncd'
+    >>> convert_to_str(np.array([[0x2800], [0x28ff]]), eol_char="\\r\\n")
+    '⠀\\r\\n⣿'
     """
-    np_chr = np.frompyfunc(chr, 1, 1)
-    return eol_char.join(np.sum(np_chr(buffer), axis=-1))
+    if len(eol_char) != 1:
+        text = convert_to_str(buffer.reshape(1, -1))
+        width = buffer.shape[1]
+        return eol_char.join(
+            text[i * width : (i + 1) * width] for i in range(buffer.shape[0])
+        )
+
+    # decode codepoints with eol column at once instead of making str per character.
+    codes = np.empty((buffer.shape[0], buffer.shape[1] + 1), dtype="<u4")
+    codes[:, :-1] = buffer
+    codes[:, -1] = ord(eol_char)
+    return codes.reshape(-1)[:-1].tobytes().decode("utf-32-le")
 
 
 def convert_to_pil_image(buffer):
@@ -38,13 +49,156 @@ def convert_to_pil_image(buffer):
     mode = {
         "bool_1": "1",
         "uint8_1": "L",
+        "uint8_2": "LA",
         "uint8_3": "RGB",
+        "uint8_4": "RGBA",
         "int32_1": "I",
         "float32_1": "F",
     }[key]
     return Image.fromarray(buffer, mode=mode)
 
 
+RESAMPLES = {
+    "nearest": Image.NEAREST,
+    "box": Image.BOX,
+    "bilinear": Image.BILINEAR,
+    "hamming": Image.HAMMING,
+    "bicubic": Image.BICUBIC,
+    "lanczos": Image.LANCZOS,
+}
+
+
+def get_reduction_factors(shape, resized_shape):
+    """
+    Get the integer factors by which shape can be reduced not to be below resized_shape.
+    >>> get_reduction_factors((2160, 3840), (48, 160))
+    (45, 24)
+    >>> get_reduction_factors((10, 10), (20, 5))
+    (1, 2)
+    """
+    return tuple(max(1, s // r) for s, r in zip(shape[:2], resized_shape))
+
+
+def _sum_by_box(values, factor, dtype):
+    """
+    Sum values in boxes of factor along the first axis, whose last box may be partial.
+    >>> _sum_by_box(np.array([1, 2, 3, 4, 5], dtype=np.uint8), 2, np.uint16)
+    array([3, 7, 5], dtype=uint16)
+    """
+    count = values.shape[0] // factor
+    sums = np.empty((-(-values.shape[0] // factor), *values.shape[1:]), dtype=dtype)
+
+    # accumulate slices of boxes one by one, which is faster than sum
+    boxes = values[: count * factor].reshape(count, factor, *values.shape[1:])
+    sums[:count] = boxes[:, 0]
+    for i in range(1, factor):
+        sums[:count] += boxes[:, i]
+    if count < len(sums):
+        sums[count] = values[count * factor :].sum(axis=0, dtype=dtype)
+    return sums
+
+
+def _get_box_sizes(size, factor):
+    sizes = np.full(-(-size // factor), factor)
+    sizes[-1] = size - factor * (len(sizes) - 1)
+    return sizes
+
+
+def reduce_by_box(buffer, factors):
+    """
+    Reduce pixels by integer factors with the mean of each box.
+    Boxes at the bottom and right edges may be partial, which are the means of
+    the remainder pixels, so the edges are not cropped.
+    The means of uint8 are rounded to uint8, and the others are in float.
+    >>> reduce_by_box(np.array([[0, 2, 4], [2, 4, 9]], dtype=np.uint8), (2, 2))
+    array([[2, 7]], dtype=uint8)
+    >>> reduce_by_box(np.array([[0, 2, 4], [2, 4, 9]], dtype=np.uint16), (2, 2))
+    array([[2. , 6.5]], dtype=float32)
+    """
+    fy, fx = factors
+    if buffer.dtype == np.uint8:
+        dtype = np.uint16 if fy * fx <= 257 else np.uint32
+    else:
+        dtype = np.float64 if buffer.dtype == np.float64 else np.float32
+
+    sums = _sum_by_box(buffer, fy, dtype)
+    sums = np.moveaxis(_sum_by_box(np.moveaxis(sums, 1, 0), fx, dtype), 0, 1)
+
+    area = np.outer(
+        _get_box_sizes(buffer.shape[0], fy), _get_box_sizes(buffer.shape[1], fx)
+    )
+    if buffer.ndim == 3:
+        area = area[..., np.newaxis]
+    if buffer.dtype == np.uint8:
+        return ((sums + area // 2) // area).astype(np.uint8)
+    return (sums / area).astype(dtype, copy=False)
+
+
+# buffers larger than this are decimated by strides before resizing
+DECIMATION_BYTES = 1 << 26
+
+
+def decimate(
+    buffer, resized_shape, oversample=4, max_bytes=DECIMATION_BYTES, chunk_bytes=1 << 22
+):
+    """
+    Take every n-th pixels of large buffer to keep oversample times resized_shape.
+    Taken rows are copied chunk by chunk, so memory is bounded by chunk_bytes
+    in addition to the result, and memory mapped arrays read only their pages.
+    >>> buffer = np.zeros((4000, 3000), dtype=np.uint8)
+    >>> decimate(buffer, (40, 30), max_bytes=0).shape
+    (160, 120)
+    >>> decimate(buffer, (40, 30)) is buffer
+    True
+    """
+    if buffer.nbytes <= max_bytes:
+        return buffer
+    steps = [max(1, s // (oversample * r)) for s, r in zip(buffer.shape, resized_shape)]
+    if steps == [1, 1]:
+        return buffer
+
+    view = buffer[:: steps[0], :: steps[1]]
+    decimated = np.empty(view.shape, dtype=view.dtype)
+    rows = max(1, chunk_bytes // max(1, buffer[0].nbytes))
+    for top in range(0, len(view), rows):
+        decimated[top : top + rows] = view[top : top + rows]
+    return decimated
+
+
+def resize(buffer, resized_shape, resample="bicubic"):
+    """
+    Resize to displaing image size with the resample filter.
+    Large downscale is reduced by integer factors with box at first,
+    then the residual is resized with the filter.
+    Buffers larger than DECIMATION_BYTES are decimated by strides before them.
+    >>> buffer = np.arange(9).reshape(3,3).astype(np.uint8)
+    >>> resized = resize(buffer, (9, 9))
+    >>> resized.shape
+    (9, 9)
+
+    Buffer is returned as it is if the shape is not changed.
+    >>> resize(buffer, (3, 3)) is buffer
+    True
+    """
+    resized_shape = tuple(resized_shape)
+    if resized_shape == buffer.shape[:2]:
+        return buffer
+    if resample not in RESAMPLES:
+        raise ValueError("Unknown resample filter: {}".format(resample))
+    buffer = decimate(buffer, resized_shape)
+
+    # other dtypes are converted to uint8 by normalize.fit before resizing
+    factors = get_reduction_factors(buffer.shape, resized_shape)
+    if resample != "nearest" and 1 < max(factors) and buffer.dtype == np.uint8:
+        buffer = reduce_by_box(buffer, factors)
+    img = convert_to_pil_image(buffer)
+
+    size = (resized_shape[1], resized_shape[0])
+    if img.size != size:
+        img = img.resize(size, RESAMPLES[resample])
+    return np.asarray(img)
+
+
 def get_diff_to_next_multiple(value, n):
     """
     Get the value which is greater equal than value and  divisible by n.
@@ -55,27 +209,36 @@ def get_diff_to_next_multiple(value, n):
     return 0 if rem == 0 else n - rem
 
 
-def pad_to_multiple_of_shape(buffer, shape):
+def pad_to_multiple_of_shape(buffer, shape, mode="constant"):
     """
     Padding to multiples of shape.
     >>> pad_to_multiple_of_shape(np.zeros((9, 9)), (4, 2)).shape
     (12, 10)
+
+    Padding with the edge values if mode is 'edge'.
+    >>> pad_to_multiple_of_shape(np.array([[1, 2]]), (2, 1), "edge")
+    array([[1, 2],
+           [1, 2]])
     """
-    zero_value = False if buffer.dtype == np.bool else 0
     diff_height = get_diff_to_next_multiple(buffer.shape[0], shape[0])
     diff_width = get_diff_to_next_multiple(buffer.shape[1], shape[1])
     pad_width = [(0, diff_height), (0, diff_width)]
     if len(buffer.shape) == 3:
         pad_width.append((0, 0))
+    if mode == "edge":
+        return np.pad(buffer, pad_width, "edge")
+    zero_value = False if buffer.dtype == np.bool else 0
     return np.pad(buffer, pad_width, "constant", constant_values=zero_value)
 
 
-def get_termianl_pixels(cell_shape):
+def get_termianl_pixels(cell_shape, geometry=None):
     """
     Get terminal size in pixels.
+    geometry is queried by get_terminal_geometry if it is not given.
     """
-    w, h = get_terminal_size()
-    return get_pixels_of_shape(ShapeByCells(h, w), cell_shape)
+    if geometry is None:
+        geometry = get_terminal_geometry()
+    return get_pixels_of_shape(ShapeByCells(geometry.rows, geometry.cols), cell_shape)
 
 
 def get_pixels_of_shape(shape, cell_shape, term_pixels=None):
@@ -106,12 +269,12 @@ def get_pixels_of_shape(shape, cell_shape, term_pixels=None):
 
 
 def get_resized_shape(
-    buffer, shape, cell_shape, preserve_aspect_ratio, shrink_to_terminal
+    buffer, shape, cell_shape, preserve_aspect_ratio, shrink_to_terminal, geometry=None
 ):
     """
     Get the shape of resized buffer.
     """
-    term_pixels = get_termianl_pixels(cell_shape)
+    term_pixels = get_termianl_pixels(cell_shape, geometry)
     resized_shape = get_pixels_of_shape(shape, cell_shape, term_pixels)
 
     if shrink_to_terminal:
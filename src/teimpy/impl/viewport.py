@@ -0,0 +1,199 @@
+import math
+
+import numpy as np
+
+from ..shape import ShapeByPixels
+from .normalize import as_channel_last
+from .terminal import get_cell_pixels, get_terminal_geometry
+from .util import get_termianl_pixels, reduce_by_box
+
+# rows of the halved level which are reduced at once to bound temporary memory
+_CHUNK_ROWS = 1024
+
+# nominal pixels of a cell for drawers which draw by pixels
+CELL_SHAPE = (16, 8)
+
+# display pixels per image pixel at the largest zoom
+MAX_ZOOM = 32.0
+
+
+def _halve(level):
+    """
+    Halve the level by the mean of 2x2 pixels in its own dtype.
+    >>> _halve(np.array([[0, 2], [4, 7], [9, 9]], dtype=np.uint16))
+    array([[3]], dtype=uint16)
+    """
+    height, width = level.shape[0] // 2, level.shape[1] // 2
+    halved = np.empty((height, width, *level.shape[2:]), dtype=level.dtype)
+    for top in range(0, height, _CHUNK_ROWS):
+        # the odd last row and column are dropped like the shape of the level
+        rows = level[2 * top : 2 * min(height, top + _CHUNK_ROWS), : 2 * width]
+        reduced = reduce_by_box(rows, (2, 2))
+        if level.dtype == np.bool_:
+            reduced = 0.5 <= reduced
+        elif level.dtype.kind in "iu" and level.dtype != np.uint8:
+            reduced = np.rint(reduced)
+        halved[top : top + len(reduced)] = reduced
+    return halved
+
+
+class ImagePyramid:
+    """
+    Mipmap pyramid of the image, whose level is halved from the previous one.
+    Levels are built one by one when they are requested at first.
+    >>> pyramid = ImagePyramid(np.zeros((1000, 600), dtype=np.uint8))
+    >>> pyramid.depth, pyramid.built
+    (10, 1)
+    >>> pyramid.get_level(3).shape, pyramid.built
+    ((125, 75), 4)
+    """
+
+    def __init__(self, buffer):
+        buffer = as_channel_last(buffer)
+        self.depth = int(math.log2(min(buffer.shape[:2]))) + 1
+        self._levels = [buffer]
+
+    @property
+    def shape(self):
+        return self._levels[0].shape
+
+    @property
+    def built(self):
+        return len(self._levels)
+
+    def get_level(self, level):
+        if not 0 <= level < self.depth:
+            raise ValueError("level must be in 0 to {}.".format(self.depth - 1))
+        while len(self._levels) <= level:
+            self._levels.append(_halve(self._levels[-1]))
+        return self._levels[level]
+
+
+def _get_level_index(zoom, depth):
+    """
+    Get the coarsest level which has at least as many pixels as displayed.
+    >>> _get_level_index(0.3, 10), _get_level_index(0.5, 10), _get_level_index(4.0, 10)
+    (1, 1, 0)
+    """
+    return max(0, min(depth - 1, int(math.floor(math.log2(1.0 / zoom) + 1e-9))))
+
+
+class Viewport:
+    """
+    Window of the image which is panned and zoomed interactively.
+    (x, y) is the point of the image at the center, and zoom is display pixels per
+    image pixel. Windows are drawn from the nearest level of ImagePyramid, so their
+    cost depends on the size of the viewport rather than the image.
+    shape is the viewport in display pixels, which fills the terminal by default.
+    options are passed to draw of the drawer.
+    >>> from .block import BlockDrawer
+    >>> buffer = np.zeros((4000, 6000), dtype=np.uint8)
+    >>> viewport = Viewport(BlockDrawer(), buffer, (40, 60))
+    >>> viewport.zoom
+    0.01
+    >>> viewport.get_window()
+    (6, 0, 0, 62, 93)
+    >>> viewport.press("+"), viewport.press("l"), viewport.press("q")
+    (True, True, False)
+    >>> viewport.x, viewport.y, viewport.zoom
+    (3750.0, 2000.0, 0.02)
+    """
+
+    def __init__(self, drawer, buffer, shape=None, **options):
+        self.drawer = drawer
+        self.pyramid = (
+            buffer if isinstance(buffer, ImagePyramid) else ImagePyramid(buffer)
+        )
+        self.shape = shape
+        self.options = options
+        self.fit()
+
+    def get_display_shape(self):
+        if self.shape is not None:
+            return tuple(self.shape)
+        geometry = get_terminal_geometry()
+        cell_shape = getattr(self.drawer, "CELL_SHAPE", None)
+        if cell_shape is None:
+            cell_shape = get_cell_pixels(CELL_SHAPE, geometry)
+        return get_termianl_pixels(cell_shape, geometry)
+
+    def _get_fit_zoom(self):
+        height, width = self.get_display_shape()
+        return min(height / self.pyramid.shape[0], width / self.pyramid.shape[1])
+
+    def fit(self):
+        """
+        Show the whole image at the center.
+        """
+        self.zoom = self._get_fit_zoom()
+        self.y = self.pyramid.shape[0] / 2
+        self.x = self.pyramid.shape[1] / 2
+
+    def move_to(self, x, y):
+        self.x = min(max(0.0, float(x)), float(self.pyramid.shape[1]))
+        self.y = min(max(0.0, float(y)), float(self.pyramid.shape[0]))
+
+    def pan(self, dx, dy):
+        """
+        Move the center by display pixels.
+        """
+        self.move_to(self.x + dx / self.zoom, self.y + dy / self.zoom)
+
+    def zoom_by(self, factor):
+        """
+        Scale zoom around the center, which is limited between the whole image and MAX_ZOOM.
+        """
+        fit_zoom = self._get_fit_zoom()
+        self.zoom = min(max(fit_zoom, self.zoom * factor), max(fit_zoom, MAX_ZOOM))
+
+    def press(self, key):
+        """
+        Navigate by vi like keys, arrow keys, '+', '-' and '0' to fit.
+        Returns False if key is not for navigation.
+        """
+        height, width = self.get_display_shape()
+        actions = {
+            "h": lambda: self.pan(-width / 4, 0),
+            "l": lambda: self.pan(width / 4, 0),
+            "k": lambda: self.pan(0, -height / 4),
+            "j": lambda: self.pan(0, height / 4),
+            "+": lambda: self.zoom_by(2.0),
+            "=": lambda: self.zoom_by(2.0),
+            "-": lambda: self.zoom_by(0.5),
+            "0": self.fit,
+        }
+        arrows = {"\x1b[D": "h", "\x1b[C": "l", "\x1b[A": "k", "\x1b[B": "j"}
+        action = actions.get(arrows.get(key, key))
+        if action is None:
+            return False
+        action()
+        return True
+
+    def get_window(self):
+        """
+        Get the level and the rectangle of it as (level, top, left, height, width).
+        """
+        level = _get_level_index(self.zoom, self.pyramid.depth)
+        scale = 2**level
+        image_height, image_width = self.pyramid.shape[0], self.pyramid.shape[1]
+        level_height, level_width = image_height // scale, image_width // scale
+
+        # display pixels per level pixel
+        zoom = self.zoom * scale
+        height, width = self.get_display_shape()
+        height = min(level_height, max(1, int(round(height / zoom))))
+        width = min(level_width, max(1, int(round(width / zoom))))
+        top = int(round(self.y / scale - height / 2))
+        left = int(round(self.x / scale - width / 2))
+        top = min(max(0, top), level_height - height)
+        left = min(max(0, left), level_width - width)
+        return (level, top, left, height, width)
+
+    def draw(self):
+        level, top, left, height, width = self.get_window()
+        window = self.pyramid.get_level(level)[top : top + height, left : left + width]
+        zoom = self.zoom * 2**level
+        shape = ShapeByPixels(
+            max(1, int(round(height * zoom))), max(1, int(round(width * zoom)))
+        )
+        return self.drawer.draw(window, shape, **self.options)
@@ -20,18 +20,18 @@
 # CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
 #
 
+import os
 from ctypes import (
     cdll,
     c_void_p,
     c_int,
-    c_byte,
+    c_ubyte,
     c_char_p,
     POINTER,
     byref,
     CFUNCTYPE,
     string_at,
 )
-from ctypes.util import find_library
 
 # limitations
 SIXEL_OUTPUT_PACKET_SIZE = 16384
@@ -390,155 +390,202 @@ SIXEL_OPTFLAG_VERBOSE = "v"  # -v, --verbose: show debugging info
 SIXEL_OPTFLAG_VERSION = "V"  # -V, --version: show version and license info
 SIXEL_OPTFLAG_HELP = "H"  # -H, --help: show this help
 
-# load shared library
+# load shared library lazily and declare prototypes of the functions only once
 from pathlib import Path
+from threading import Lock
+
+LIBSIXEL_PATH = Path(__file__).parent / "libsixel.so"
+
+_sixel = None
+_sixel_lock = Lock()
+
+_sixel_write_function = CFUNCTYPE(c_int, c_void_p, c_int, c_void_p)
+
+_PROTOTYPES = {
+    "sixel_helper_format_error": (c_char_p, [c_int]),
+    "sixel_helper_compute_depth": (c_int, [c_int]),
+    "sixel_output_new": (
+        c_int,
+        [POINTER(c_void_p), _sixel_write_function, c_void_p, c_void_p],
+    ),
+    "sixel_output_ref": (None, [c_void_p]),
+    "sixel_output_unref": (None, [c_void_p]),
+    "sixel_output_get_8bit_availability": (c_int, [c_void_p]),
+    "sixel_output_set_8bit_availability": (None, [c_void_p, c_int]),
+    "sixel_output_set_gri_arg_limit": (None, [c_void_p, c_int]),
+    "sixel_output_set_penetrate_multiplexer": (None, [c_void_p, c_int]),
+    "sixel_output_set_skip_dcs_envelope": (None, [c_void_p, c_int]),
+    "sixel_output_set_palette_type": (None, [c_void_p, c_int]),
+    "sixel_output_set_encode_policy": (None, [c_void_p, c_int]),
+    "sixel_dither_new": (c_int, [POINTER(c_void_p), c_int, c_void_p]),
+    "sixel_dither_get": (c_void_p, [c_int]),
+    "sixel_dither_destroy": (None, [c_void_p]),
+    "sixel_dither_ref": (None, [c_void_p]),
+    "sixel_dither_unref": (None, [c_void_p]),
+    "sixel_dither_initialize": (
+        c_int,
+        [c_void_p, c_char_p, c_int, c_int, c_int, c_int, c_int, c_int],
+    ),
+    "sixel_dither_set_diffusion_type": (None, [c_void_p, c_int]),
+    "sixel_dither_get_num_of_palette_colors": (c_int, [c_void_p]),
+    "sixel_dither_get_num_of_histogram_colors": (c_int, [c_void_p]),
+    "sixel_dither_get_palette": (POINTER(c_ubyte), [c_void_p]),
+    "sixel_dither_set_palette": (None, [c_void_p, c_char_p]),
+    "sixel_dither_set_complexion_score": (None, [c_void_p, c_int]),
+    "sixel_dither_set_body_only": (None, [c_void_p, c_int]),
+    "sixel_dither_set_optimize_palette": (None, [c_void_p, c_int]),
+    "sixel_dither_set_pixelformat": (None, [c_void_p, c_int]),
+    "sixel_dither_set_transparent": (None, [c_void_p, c_int]),
+    "sixel_encode": (c_int, [c_char_p, c_int, c_int, c_int, c_void_p, c_void_p]),
+    "sixel_encoder_new": (c_int, [POINTER(c_void_p), c_void_p]),
+    "sixel_encoder_ref": (None, [c_void_p]),
+    "sixel_encoder_unref": (None, [c_void_p]),
+    "sixel_encoder_setopt": (c_int, [c_void_p, c_int, c_char_p]),
+    "sixel_encoder_encode": (c_int, [c_void_p, c_char_p]),
+    "sixel_encoder_encode_bytes": (
+        c_int,
+        [c_void_p, c_char_p, c_int, c_int, c_int, c_char_p, c_int],
+    ),
+    "sixel_decoder_new": (c_int, [POINTER(c_void_p), c_void_p]),
+    "sixel_decoder_ref": (None, [c_void_p]),
+    "sixel_decoder_unref": (None, [c_void_p]),
+    "sixel_decoder_setopt": (c_int, [c_void_p, c_int, c_char_p]),
+    "sixel_decoder_decode": (c_int, [c_void_p]),
+}
+
+
+def _load_library(path):
+    lib = cdll.LoadLibrary(str(path))
+    for name, (restype, argtypes) in _PROTOTYPES.items():
+        # some functions are not exported by old versions of libsixel
+        func = getattr(lib, name, None)
+        if func is not None:
+            func.restype = restype
+            func.argtypes = argtypes
+    return lib
+
+
+def _lib():
+    global _sixel
+    if _sixel is None:
+        with _sixel_lock:
+            if _sixel is None:
+                _sixel = _load_library(LIBSIXEL_PATH)
+    return _sixel
+
+
+def _check_status(status):
+    if SIXEL_FAILED(status):
+        message = sixel_helper_format_error(status)
+        raise RuntimeError(message)
 
-_sixel = cdll.LoadLibrary(str(Path(__file__).parent / "libsixel.so"))
 
 # convert error status code int formatted string
 def sixel_helper_format_error(status):
-    _sixel.sixel_helper_format_error.restype = c_char_p
-    _sixel.sixel_helper_format_error.argtypes = [c_int]
-    return _sixel.sixel_helper_format_error(status)
+    return _lib().sixel_helper_format_error(status)
 
 
 # compute pixel depth from pixelformat
 def sixel_helper_compute_depth(pixelformat):
-    _sixel.sixel_helper_compute_depth.restype = c_int
-    _sixel.sixel_encoder_encode.argtypes = [c_int]
-    return _sixel.sixel_helper_compute_depth(pixelformat)
+    return _lib().sixel_helper_compute_depth(pixelformat)
 
 
 # create new output context object
 def sixel_output_new(fn_write, priv=None, allocator=c_void_p(None)):
-    def _fn_write_local(data, size, priv_from_c):
+    def _fn_write_local(data, size):
         fn_write(string_at(data, size), priv)
+
+    return sixel_output_new_raw(_fn_write_local, allocator)
+
+
+# create new output context object whose fn_write receives address and size of data
+def sixel_output_new_raw(fn_write, allocator=c_void_p(None)):
+    def _fn_write_local(data, size, priv_from_c):
+        fn_write(data, size)
         return size
 
-    sixel_write_function = CFUNCTYPE(c_int, c_char_p, c_int, c_void_p)
-    _sixel.sixel_output_new.restype = c_int
-    _sixel.sixel_output_new.argtypes = [
-        POINTER(c_void_p),
-        sixel_write_function,
-        c_void_p,
-        c_void_p,
-    ]
     output = c_void_p(None)
-    _fn_write = sixel_write_function(_fn_write_local)
-    _fn_write.restype = c_int
-    _fn_write.argtypes = [sixel_write_function, c_void_p, c_void_p]
-    status = _sixel.sixel_output_new(
+    _fn_write = _sixel_write_function(_fn_write_local)
+    status = _lib().sixel_output_new(
         byref(output), _fn_write, c_void_p(None), allocator
     )
-    if SIXEL_FAILED(status):
-        message = sixel_helper_format_error(status)
-        raise RuntimeError(message)
+    _check_status(status)
     output.__fn_write = _fn_write
     return output
 
 
 # increase reference count of output object (thread-unsafe)
 def sixel_output_ref(output):
-    _sixel.sixel_output_ref.restype = None
-    _sixel.sixel_output_ref.argtypes = [c_void_p]
-    _sixel.sixel_output_ref(output)
+    _lib().sixel_output_ref(output)
 
 
 # decrease reference count of output object (thread-unsafe)
 def sixel_output_unref(output):
-    _sixel.sixel_output_unref.restype = None
-    _sixel.sixel_output_unref.argtypes = [c_void_p]
-    _sixel.sixel_output_unref(output)
+    _lib().sixel_output_unref(output)
     output.__fn_write = None
 
 
 # get 8bit output mode which indicates whether it uses C1 control characters
 def sixel_output_get_8bit_availability(output):
-    _sixel.sixel_output_get_8bit_availability.restype = None
-    _sixel.sixel_output_get_8bit_availability.argtypes = [c_void_p]
-    _sixel.sixel_output_get_8bit_availability(output)
+    return _lib().sixel_output_get_8bit_availability(output)
 
 
 # set 8bit output mode state
-def sixel_output_set_8bit_availability(output):
-    _sixel.sixel_output_set_8bit_availability.restype = None
-    _sixel.sixel_output_set_8bit_availability.argtypes = [c_void_p, c_int]
-    _sixel.sixel_output_set_8bit_availability(output)
+def sixel_output_set_8bit_availability(output, availability):
+    _lib().sixel_output_set_8bit_availability(output, availability)
 
 
 # set whether limit arguments of DECGRI('!') to 255
-def sixel_output_set_gri_arg_limit(output):
-    _sixel.sixel_output_set_gri_arg_limit.restype = None
-    _sixel.sixel_output_set_gri_arg_limit.argtypes = [c_void_p, c_int]
-    _sixel.sixel_output_set_gri_arg_limit(output)
+def sixel_output_set_gri_arg_limit(output, value):
+    _lib().sixel_output_set_gri_arg_limit(output, value)
 
 
 # set GNU Screen penetration feature enable or disable
-def sixel_output_set_penetrate_multiplexer(output):
-    _sixel.sixel_output_set_penetrate_multiplexer.restype = None
-    _sixel.sixel_output_set_penetrate_multiplexer.argtypes = [c_void_p, c_int]
-    _sixel.sixel_output_set_penetrate_multiplexer(output)
+def sixel_output_set_penetrate_multiplexer(output, penetrate):
+    _lib().sixel_output_set_penetrate_multiplexer(output, penetrate)
 
 
 # set whether we skip DCS envelope
-def sixel_output_set_skip_dcs_envelope(output):
-    _sixel.sixel_output_set_skip_dcs_envelope.restype = None
-    _sixel.sixel_output_set_skip_dcs_envelope.argtypes = [c_void_p, c_int]
-    _sixel.sixel_output_set_skip_dcs_envelope(output)
+def sixel_output_set_skip_dcs_envelope(output, skip):
+    _lib().sixel_output_set_skip_dcs_envelope(output, skip)
 
 
 # set palette type: RGB or HLS
-def sixel_output_set_palette_type(output):
-    _sixel.sixel_output_set_palette_type.restype = None
-    _sixel.sixel_output_set_palette_type.argtypes = [c_void_p, c_int]
-    _sixel.sixel_output_set_palette_type(output)
+def sixel_output_set_palette_type(output, palettetype):
+    _lib().sixel_output_set_palette_type(output, palettetype)
 
 
 # set encodeing policy: auto, fast or size
-def sixel_output_set_encode_policy(output):
-    _sixel.sixel_output_set_encode_policy.restype = None
-    _sixel.sixel_output_set_encode_policy.argtypes = [c_void_p, c_int]
-    _sixel.sixel_output_set_encode_policy(output)
+def sixel_output_set_encode_policy(output, encode_policy):
+    _lib().sixel_output_set_encode_policy(output, encode_policy)
 
 
 # create dither context object
 def sixel_dither_new(ncolors, allocator=None):
-    _sixel.sixel_dither_new.restype = c_int
-    _sixel.sixel_dither_new.argtypes = [POINTER(c_void_p), c_int, c_void_p]
     dither = c_void_p(None)
-    status = _sixel.sixel_dither_new(byref(dither), ncolors, allocator)
-    if SIXEL_FAILED(status):
-        message = sixel_helper_format_error(status)
-        raise RuntimeError(message)
+    status = _lib().sixel_dither_new(byref(dither), ncolors, allocator)
+    _check_status(status)
     return dither
 
 
 # get built-in dither context object
 def sixel_dither_get(builtin_dither):
-    _sixel.sixel_dither_get.restype = c_void_p
-    _sixel.sixel_dither_get.argtypes = [c_int]
-    return _sixel.sixel_dither_get(builtin_dither)
+    return _lib().sixel_dither_get(builtin_dither)
 
 
 # destroy dither context object
 def sixel_dither_destroy(dither):
-    _sixel.sixel_dither_destroy.restype = None
-    _sixel.sixel_dither_destroy.argtypes = [c_void_p]
-    return _sixel.sixel_dither_destroy(dither)
+    return _lib().sixel_dither_destroy(dither)
 
 
 # increase reference count of dither context object (thread-unsafe)
 def sixel_dither_ref(dither):
-    _sixel.sixel_dither_ref.restype = None
-    _sixel.sixel_dither_ref.argtypes = [c_void_p]
-    return _sixel.sixel_dither_ref(dither)
+    return _lib().sixel_dither_ref(dither)
 
 
 # decrease reference count of dither context object (thread-unsafe)
 def sixel_dither_unref(dither):
-    _sixel.sixel_dither_unref.restype = None
-    _sixel.sixel_dither_unref.argtypes = [c_void_p]
-    return _sixel.sixel_dither_unref(dither)
+    return _lib().sixel_dither_unref(dither)
 
 
 # initialize internal palette from specified pixel buffer
@@ -552,18 +599,7 @@ def sixel_dither_initialize(
     method_for_rep=SIXEL_REP_AUTO,
     quality_mode=SIXEL_QUALITY_AUTO,
 ):
-    _sixel.sixel_dither_initialize.restype = c_int
-    _sixel.sixel_dither_initialize.argtypes = [
-        c_void_p,
-        c_char_p,
-        c_int,
-        c_int,
-        c_int,
-        c_int,
-        c_int,
-        c_int,
-    ]
-    status = _sixel.sixel_dither_initialize(
+    status = _lib().sixel_dither_initialize(
         dither,
         data,
         width,
@@ -573,139 +609,96 @@ def sixel_dither_initialize(
         method_for_rep,
         quality_mode,
     )
-    if SIXEL_FAILED(status):
-        message = sixel_helper_format_error(status)
-        raise RuntimeError(message)
+    _check_status(status)
 
 
 # set diffusion type, choose from enum methodForDiffuse
 def sixel_dither_set_diffusion_type(dither, method_for_diffuse):
-    _sixel.sixel_dither_set_diffusion_type.restype = None
-    _sixel.sixel_dither_set_diffusion_type.argtypes = [c_void_p, c_int]
-    _sixel.sixel_dither_set_diffusion_type(dither, method_for_diffuse)
+    _lib().sixel_dither_set_diffusion_type(dither, method_for_diffuse)
 
 
 # get number of palette colors
 def sixel_dither_get_num_of_palette_colors(dither):
-    _sixel.sixel_dither_get_num_of_palette_colors.restype = c_int
-    _sixel.sixel_dither_get_num_of_palette_colors.argtypes = [c_void_p]
-    return _sixel.sixel_dither_get_num_of_palette_colors(dither)
+    return _lib().sixel_dither_get_num_of_palette_colors(dither)
 
 
 # get number of histogram colors */
 def sixel_dither_get_num_of_histogram_colors(dither):
-    _sixel.sixel_dither_get_num_of_histogram_colors.restype = c_int
-    _sixel.sixel_dither_get_num_of_histogram_colors.argtypes = [c_void_p]
-    return _sixel.sixel_dither_get_num_of_histogram_colors(dither)
+    return _lib().sixel_dither_get_num_of_histogram_colors(dither)
 
 
+# get rgb values of palette colors
 def sixel_dither_get_palette(dither):
-    _sixel.sixel_dither_get_palette.restype = c_char_p
-    _sixel.sixel_dither_get_palette.argtypes = [c_void_p]
-    cpalette = _sixel.sixel_dither_get_palette(dither)
-    return [ord(c) for c in cpalette]
+    ncolors = sixel_dither_get_num_of_palette_colors(dither)
+    cpalette = _lib().sixel_dither_get_palette(dither)
+    return list(cpalette[: 3 * ncolors])
 
 
+# set rgb values of palette colors
 def sixel_dither_set_palette(dither, palette):
-    _sixel.sixel_dither_set_palette.restype = None
-    _sixel.sixel_dither_set_palette.argtypes = [c_void_p, c_char_p]
-    cpalette = "".join(map(chr, palette))
-    _sixel.sixel_dither_set_palette(dither, cpalette)
+    _lib().sixel_dither_set_palette(dither, bytes(palette))
 
 
 def sixel_dither_set_complexion_score(dither, score):
-    _sixel.sixel_dither_set_complexion_score.restype = None
-    _sixel.sixel_dither_set_complexion_score.argtypes = [c_void_p, c_int]
-    _sixel.sixel_dither_set_complexion_score(dither, score)
+    _lib().sixel_dither_set_complexion_score(dither, score)
 
 
 def sixel_dither_set_body_only(dither, bodyonly):
-    _sixel.sixel_dither_set_body_only.restype = None
-    _sixel.sixel_dither_set_body_only.argtypes = [c_void_p, c_int]
-    _sixel.sixel_dither_set_body_only(dither, bodyonly)
+    _lib().sixel_dither_set_body_only(dither, bodyonly)
 
 
 def sixel_dither_set_optimize_palette(dither, do_opt):
-    _sixel.sixel_dither_set_optimize_palette.restype = None
-    _sixel.sixel_dither_set_optimize_palette.argtypes = [c_void_p, c_int]
-    _sixel.sixel_dither_set_optimize_palette(dither, do_opt)
+    _lib().sixel_dither_set_optimize_palette(dither, do_opt)
 
 
 def sixel_dither_set_pixelformat(dither, pixelformat):
-    _sixel.sixel_dither_set_pixelformat.restype = None
-    _sixel.sixel_dither_set_pixelformat.argtypes = [c_void_p, c_int]
-    _sixel.sixel_dither_set_pixelformat(dither, pixelformat)
+    _lib().sixel_dither_set_pixelformat(dither, pixelformat)
 
 
 def sixel_dither_set_transparent(dither, transparent):
-    _sixel.sixel_dither_set_transparent.restype = None
-    _sixel.sixel_dither_set_transparent.argtypes = [c_void_p, c_int]
-    _sixel.sixel_dither_set_transparent(dither, transparent)
+    _lib().sixel_dither_set_transparent(dither, transparent)
 
 
 # convert pixels into sixel format and write it to output context
 def sixel_encode(pixels, width, height, depth, dither, output):
-    _sixel.sixel_encode.restype = c_int
-    _sixel.sixel_encode.argtypes = [c_char_p, c_int, c_int, c_int, c_void_p, c_void_p]
-    return _sixel.sixel_encode(pixels, width, height, depth, dither, output)
+    return _lib().sixel_encode(pixels, width, height, depth, dither, output)
 
 
 # create encoder object
 def sixel_encoder_new(allocator=c_void_p(None)):
-    _sixel.sixel_encoder_new.restype = c_int
-    _sixel.sixel_encoder_new.argtypes = [POINTER(c_void_p), c_void_p]
     encoder = c_void_p(None)
-    status = _sixel.sixel_encoder_new(byref(encoder), allocator)
-    if SIXEL_FAILED(status):
-        message = sixel_helper_format_error(status)
-        raise RuntimeError(message)
+    status = _lib().sixel_encoder_new(byref(encoder), allocator)
+    _check_status(status)
     return encoder
 
 
 # increase reference count of encoder object (thread-unsafe)
 def sixel_encoder_ref(encoder):
-    _sixel.sixel_encoder_ref.restype = None
-    _sixel.sixel_encoder_ref.argtypes = [c_void_p]
-    _sixel.sixel_encoder_ref(encoder)
+    _lib().sixel_encoder_ref(encoder)
 
 
 # decrease reference count of encoder object (thread-unsafe)
 def sixel_encoder_unref(encoder):
-    _sixel.sixel_encoder_unref.restype = None
-    _sixel.sixel_encoder_unref.argtypes = [c_void_p]
-    _sixel.sixel_encoder_unref(encoder)
+    _lib().sixel_encoder_unref(encoder)
 
 
 # set an option flag to encoder object
 def sixel_encoder_setopt(encoder, flag, arg=None):
-    _sixel.sixel_encoder_setopt.restype = c_int
-    _sixel.sixel_encoder_setopt.argtypes = [c_void_p, c_int, c_char_p]
     flag = ord(flag)
     if arg:
         arg = str(arg).encode("utf-8")
-    status = _sixel.sixel_encoder_setopt(encoder, flag, arg)
-    if SIXEL_FAILED(status):
-        message = sixel_helper_format_error(status)
-        raise RuntimeError(message)
+    status = _lib().sixel_encoder_setopt(encoder, flag, arg)
+    _check_status(status)
 
 
 # load source data from specified file and encode it to SIXEL format
 def sixel_encoder_encode(encoder, filename):
-    import locale
-
-    language, encoding = locale.getdefaultlocale()
-
-    _sixel.sixel_encoder_encode.restype = c_int
-    _sixel.sixel_encoder_encode.argtypes = [c_void_p, c_char_p]
-    status = _sixel.sixel_encoder_encode(encoder, filename.encode(encoding))
-    if SIXEL_FAILED(status):
-        message = sixel_helper_format_error(status)
-        raise RuntimeError(message)
+    status = _lib().sixel_encoder_encode(encoder, os.fsencode(filename))
+    _check_status(status)
 
 
 # encode specified pixel data to SIXEL format
 def sixel_encoder_encode_bytes(encoder, buf, width, height, pixelformat, palette):
-
     depth = sixel_helper_compute_depth(pixelformat)
 
     if depth <= 0:
@@ -713,86 +706,62 @@ def sixel_encoder_encode_bytes(encoder, buf, width, height, pixelformat, palette
 
     if len(buf) < width * height * depth:
         raise ValueError(
-            "buf.len is too short : %d < %d * %d * %d" % (buf.len, width, height, depth)
+            "buf.len is too short : %d < %d * %d * %d"
+            % (len(buf), width, height, depth)
         )
 
-    if not hasattr(buf, "readonly") or buf.readonly:
-        cbuf = c_void_p.from_buffer_copy(buf)
-    else:
-        cbuf = c_void_p.from_buffer(buf)
-
     if palette:
+        cpalette = bytes(palette)
         cpalettelen = len(palette)
-        cpalette = (c_byte * cpalettelen)(*palette)
     else:
-        cpalettelen = None
         cpalette = None
+        cpalettelen = 0
 
-    _sixel.sixel_encoder_encode_bytes.restype = c_int
-    _sixel.sixel_encoder_encode.argtypes = [
-        c_void_p,
-        c_void_p,
-        c_int,
-        c_int,
-        c_int,
-        c_void_p,
-        c_int,
-    ]
-
-    status = _sixel.sixel_encoder_encode_bytes(
-        encoder, buf, width, height, pixelformat, cpalette, cpalettelen
+    status = _lib().sixel_encoder_encode_bytes(
+        encoder, bytes(buf), width, height, pixelformat, cpalette, cpalettelen
     )
-    if SIXEL_FAILED(status):
-        message = sixel_helper_format_error(status)
-        raise RuntimeError(message)
+    _check_status(status)
 
 
 # create decoder object
 def sixel_decoder_new(allocator=c_void_p(None)):
-    _sixel.sixel_decoder_new.restype = c_int
-    _sixel.sixel_decoder_new.argtypes = [POINTER(c_void_p), c_void_p]
     decoder = c_void_p(None)
-    status = _sixel.sixel_decoder_new(byref(decoder), c_void_p(None))
-    if SIXEL_FAILED(status):
-        message = sixel_helper_format_error(status)
-        raise RuntimeError(message)
+    status = _lib().sixel_decoder_new(byref(decoder), allocator)
+    _check_status(status)
     return decoder
 
 
 # increase reference count of decoder object (thread-unsafe)
 def sixel_decoder_ref(decoder):
-    _sixel.sixel_decoder_ref.restype = None
-    _sixel.sixel_decoder_ref.argtypes = [c_void_p]
-    _sixel.sixel_decoder_ref(decoder)
+    _lib().sixel_decoder_ref(decoder)
 
 
 # decrease reference count of decoder object (thread-unsafe)
 def sixel_decoder_unref(decoder):
-    _sixel.sixel_decoder_unref.restype = None
-    _sixel.sixel_decoder_unref.argtypes = [c_void_p]
-    _sixel.sixel_decoder_unref(decoder)
+    _lib().sixel_decoder_unref(decoder)
 
 
 # set an option flag to decoder object
 def sixel_decoder_setopt(decoder, flag, arg=None):
-    _sixel.sixel_decoder_setopt.restype = c_int
-    _sixel.sixel_decoder_setopt.argtypes = [c_void_p, c_int, c_char_p]
     flag = ord(flag)
     if arg:
         arg = str(arg).encode("utf-8")
-    status = _sixel.sixel_decoder_setopt(decoder, flag, arg)
-    if SIXEL_FAILED(status):
-        message = sixel_helper_format_error(status)
-        raise RuntimeError(message)
+    status = _lib().sixel_decoder_setopt(decoder, flag, arg)
+    _check_status(status)
 
 
 # load source data from stdin or the file
 def sixel_decoder_decode(decoder, infile=None):
-    _sixel.sixel_decoder_decode.restype = c_int
-    _sixel.sixel_decoder_decode.argtypes = [c_void_p]
     if infile:
         sixel_decoder_setopt(decoder, SIXEL_OPTFLAG_INPUT, infile)
-    status = _sixel.sixel_decoder_decode(decoder)
-    if SIXEL_FAILED(status):
-        message = sixel_helper_format_error(status)
-        raise RuntimeError(message)
+    status = _lib().sixel_decoder_decode(decoder)
+    _check_status(status)
+
+
+# check whether the shared library can be loaded
+def is_loadable():
+    try:
+        _lib()
+    except OSError:
+        return False
+    return True
@@ -0,0 +1,213 @@
+import re
+import sys
+import threading
+import time
+from collections import namedtuple
+from queue import Empty, Full, Queue
+
+from .drawer import Mode, get_drawer
+from .impl.terminal import get_cell_pixels, get_terminal_geometry
+
+PlayerStats = namedtuple("PlayerStats", "written dropped fps")
+
+_HIDE_CURSOR = "\x1b[?25l"
+_SHOW_CURSOR = "\x1b[?25h"
+_SAVE_CURSOR = "\x1b7"
+_RESTORE_CURSOR = "\x1b8"
+_ERASE_BELOW = "\x1b[J"
+
+# nominal pixels of a cell for graphics, if the terminal does not report it
+CELL_SHAPE = (16, 8)
+
+_SIXEL_HEIGHT = re.compile(r'\x1bP[\d;]*q"\d+;\d+;\d+;(\d+)')
+_ITERM2_HEIGHT = re.compile(r"1337;(?:Multipart)?File=[^:\a]*;height=(\d+)(px|%)?")
+
+
+def _is_graphics(text):
+    return "\x1bP" in text or "\x1b]" in text
+
+
+def _get_graphics_lines(text):
+    """
+    Get the number of lines which the sixel or iTerm2 inline image occupies.
+    Images of unknown height are assumed to fill the terminal.
+    >>> from .impl.terminal import reset_terminal_geometry, set_terminal_geometry
+    >>> set_terminal_geometry(24, 80)
+    >>> _get_graphics_lines('\\x1bP7;1;75q"1;1;8;40#0@\\x1b\\\\')
+    3
+    >>> _get_graphics_lines("\\x1b]1337;File=;width=auto;height=50%;inline=1:AA\\a")
+    12
+    >>> reset_terminal_geometry()
+    """
+    geometry = get_terminal_geometry()
+    cell_height = get_cell_pixels(CELL_SHAPE, geometry)[0]
+    rows = geometry.rows
+    found = _SIXEL_HEIGHT.search(text)
+    if found is not None:
+        return -(-int(found.group(1)) // cell_height)
+
+    found = _ITERM2_HEIGHT.search(text)
+    if found is None:
+        return max(1, rows - 1)
+    height, unit = int(found.group(1)), found.group(2)
+    if unit == "px":
+        return -(-height // cell_height)
+    if unit == "%":
+        return -(-height * rows // 100)
+    return height
+
+
+def _get_scroll_in(text):
+    """
+    Get the sequence which scrolls in the lines of the graphics before saving the
+    cursor at its top left, so the saved cursor is not moved by the scroll.
+    >>> _get_scroll_in("ab\\ncd")
+    ''
+    """
+    if not _is_graphics(text):
+        return ""
+    lines = _get_graphics_lines(text)
+    return "\n" * lines + "\x1b[{}A".format(lines) + _SAVE_CURSOR
+
+
+def _get_rewind(text):
+    """
+    Get the sequence which moves the cursor back to the top of text written with newline.
+    Sixel and iTerm2 inline images whose lines are unknown restore the saved cursor.
+    >>> _get_rewind("ab\\ncd")
+    '\\x1b[2A\\r'
+    >>> _get_rewind('\\x1bP7;1;75q"1;1;1;1#0@\\x1b\\\\')
+    '\\x1b8'
+    """
+    if _is_graphics(text):
+        return _RESTORE_CURSOR
+    return "\x1b[{}A\r".format(text.count("\n") + 1)
+
+
+def _offer(queue, item, stop):
+    while not stop.is_set():
+        try:
+            queue.put(item, timeout=0.05)
+            return True
+        except Full:
+            pass
+    return False
+
+
+class Player:
+    """
+    Player which draws frames over the previous one at the target fps.
+    A worker thread draws the next frame while the current one is written.
+    Frames which are late for the slot of the next frame are dropped, but frames
+    from a source slower than fps are shown as they come.
+    drawer is a drawer or Mode, and options are passed to its draw.
+    >>> from io import StringIO
+    >>> import numpy as np
+    >>> stream = StringIO()
+    >>> player = Player(Mode.HALF_BLOCK, fps=100, stream=stream)
+    >>> frames = [np.full((4, 2), v, dtype=np.uint8) for v in range(3)]
+    >>> player.play(frames).written
+    3
+    >>> stream.getvalue().count("\\x1b[2A\\r")
+    2
+    """
+
+    def __init__(self, drawer=Mode.BRAILLE, fps=30.0, stream=None, **options):
+        if fps <= 0:
+            raise ValueError("fps must be positive.")
+        self.drawer = get_drawer(drawer) if isinstance(drawer, Mode) else drawer
+        self.fps = fps
+        self.stream = sys.stdout if stream is None else stream
+        self.options = options
+        self.written = 0
+        self.dropped = 0
+        self._first = None
+        self._last = None
+
+    @property
+    def stats(self):
+        elapsed = 0.0 if self._first is None else self._last - self._first
+        fps = (self.written - 1) / elapsed if 0.0 < elapsed else 0.0
+        return PlayerStats(self.written, self.dropped, fps)
+
+    def _write(self, text):
+        self.stream.write(text)
+        self.stream.flush()
+
+    def _draw_frames(self, frames, queue, stop):
+        interval = 1.0 / self.fps
+        start = None
+        try:
+            iterator = iter(frames)
+            index = 0
+            while not stop.is_set():
+                requested = time.perf_counter()
+                try:
+                    frame = next(iterator)
+                except StopIteration:
+                    break
+                now = time.perf_counter()
+
+                if start is None or interval < now - requested:
+                    # the source is slower than fps, so the frame is due now
+                    start = now - index * interval
+                elif start + (index + 1) * interval < now:
+                    self.dropped += 1
+                    index += 1
+                    continue
+
+                due = start + index * interval
+                if not _offer(
+                    queue, (due, self.drawer.draw(frame, **self.options)), stop
+                ):
+                    return
+                index += 1
+            _offer(queue, None, stop)
+        except BaseException as e:
+            _offer(queue, e, stop)
+
+    def play(self, frames):
+        """
+        Play frames of the iterable, which may be a generator of a live source.
+        Returns PlayerStats of written and dropped frames and the achieved fps.
+        """
+        self.written = 0
+        self.dropped = 0
+        self._first = None
+        self._last = None
+
+        stop = threading.Event()
+        queue = Queue(maxsize=1)
+        worker = threading.Thread(
+            target=self._draw_frames, args=(frames, queue, stop), daemon=True
+        )
+        rewind = _SAVE_CURSOR
+        self._write(_HIDE_CURSOR)
+        worker.start()
+        try:
+            while True:
+                item = queue.get()
+                if item is None:
+                    break
+                if isinstance(item, BaseException):
+                    raise item
+
+                due, text = item
+                delay = due - time.perf_counter()
+                if 0.0 < delay:
+                    time.sleep(delay)
+                self._write(rewind + _get_scroll_in(text) + text + "\n" + _ERASE_BELOW)
+                rewind = _get_rewind(text)
+
+                self._last = time.perf_counter()
+                if self._first is None:
+                    self._first = self._last
+                self.written += 1
+        finally:
+            stop.set()
+            try:
+                queue.get_nowait()
+            except Empty:
+                pass
+            self._write(_SHOW_CURSOR)
+        return self.stats
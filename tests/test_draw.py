@@ -1,9 +1,35 @@
 import os
+import signal
+import time
+from base64 import b64decode
+from io import BytesIO, StringIO
 
 import numpy as np
 import pytest
 
-from teimpy import Mode, get_drawer
+from teimpy import (
+    CachedDrawer,
+    DeltaRenderer,
+    Mode,
+    Player,
+    RenderCache,
+    SixelDeltaRenderer,
+    Viewport,
+    disable_geometry_cache,
+    enable_geometry_cache,
+    get_drawer,
+    get_terminal_geometry,
+    reset_terminal_geometry,
+    set_terminal_geometry,
+)
+from teimpy.impl.sixel import SixelDrawer
+from teimpy.impl.util import reduce_by_box
+from teimpy.libsixel import is_loadable
+
+requires_libsixel = pytest.mark.skipif(
+    not is_loadable(), reason="libsixel.so is not available"
+)
+without_libsixel = pytest.mark.skipif(is_loadable(), reason="libsixel.so is used")
 
 
 @pytest.fixture(
@@ -46,9 +72,32 @@ RkdISUpTVFVWV1hZWmNkZWZnaGlqc3R1dnd4eXqDhIWGh4iJipKTlJWWl5iZmqKjpKWmp6ipqrKztLW\
 \x07",
             "",
         ),
+        (
+            Mode.ITERM2_INLINE_IMAGE,
+            {"compression": "auto"},
+            "\x1b]1337;File=;width=auto;height=auto;size=92;prese\
+rveAspectRatio=1;inline=1:iVBORw0KGgoAAAANSUhEUgAAAAEAAAABCAAAAAA6fptVAAAACklEQ\
+VR4nGNgAAAAAgABSK+kcQAAAABJRU5ErkJggg==\x07",
+            "",
+        ),
         (Mode.BRAILLE, {}, "\u2800", ""),
+        (Mode.BRAILLE, {"dither": "none"}, "\u2800", ""),
+        (Mode.BRAILLE, {"dither": "ordered"}, "\u2800", ""),
+        (Mode.COLOR_BRAILLE, {}, "\x1b[38;2;0;0;0m\u2800", ""),
         (Mode.HALF_BLOCK, {}, "\x1b[38;2;0;0;0m▀", ""),
-        (Mode.SIXEL, {}, '\x1bP7;1;75q"1;1;1;1$\x1b\\', ""),
+        (Mode.HALF_BLOCK, {"elide_repeated_sgr": True}, "\x1b[38;2;0;0;0m▀", ""),
+        (Mode.HALF_BLOCK_256, {}, "\x1b[38;5;16m▀", ""),
+        (Mode.HALF_BLOCK_16, {}, "\x1b[30m▀", ""),
+        (Mode.QUADRANT, {}, "\x1b[48;2;0;0;0m\x1b[38;2;0;0;0m ", ""),
+        (Mode.SEXTANT, {}, "\x1b[48;2;0;0;0m\x1b[38;2;0;0;0m ", ""),
+        pytest.param(
+            (Mode.SIXEL, {}, '\x1bP7;1;75q"1;1;1;1$\x1b\\', ""),
+            marks=requires_libsixel,
+        ),
+        pytest.param(
+            (Mode.SIXEL, {}, '\x1bP7;1;75q"1;1;1;1#0;2;0;0;0#0@\x1b\\', ""),
+            marks=without_libsixel,
+        ),
     ],
 )
 def setup(request):
@@ -66,3 +115,319 @@ def test_draw_item2_inline_image(setup):
     actual = drawer.draw(setup["buffer"], **setup["param"])
 
     assert actual == setup["expected"]
+
+
+def test_draw_iterm2_with_alpha():
+    os.environ["TERM"] = ""
+    drawer = get_drawer(Mode.ITERM2_INLINE_IMAGE)
+    buffer = np.zeros((8, 8, 4), dtype=np.uint8)
+
+    actual = drawer.draw(buffer)
+    data = b64decode(actual[actual.index(":") + 1 : -1])
+    assert data.startswith(b"\x89PNG")
+    assert drawer.draw(buffer) == drawer.draw(buffer, compression="PNG")
+    assert drawer.draw(buffer, background=(0, 0, 0)) != actual
+
+
+def test_draw_to_iterm2_multipart():
+    os.environ["TERM"] = ""
+    buffer = np.random.RandomState(0).randint(0, 256, (512, 512), dtype=np.uint8)
+    expected = get_drawer(Mode.ITERM2_INLINE_IMAGE).draw(buffer, compression="PNG")
+
+    stream = BytesIO()
+    drawer = get_drawer(Mode.ITERM2_INLINE_IMAGE)
+    drawer.draw_to(stream, buffer, compression="PNG", multipart=True)
+    messages = stream.getvalue().decode("ascii").split("\a")
+
+    assert messages[0].startswith("\x1b]1337;MultipartFile=;width=auto")
+    assert messages[-2] == "\x1b]1337;FileEnd"
+    parts = [m[len("\x1b]1337;FilePart=") :] for m in messages[1:-2]]
+    assert 1 < len(parts)
+    assert b64decode("".join(parts)) == b64decode(expected.split(":")[1][:-1])
+
+
+@requires_libsixel
+def test_draw_sixel_session():
+    os.environ["TERM"] = ""
+    buffer = np.random.RandomState(0).randint(0, 256, (12, 8, 3), dtype=np.uint8)
+    expected = get_drawer(Mode.SIXEL).draw(buffer)
+
+    with get_drawer(Mode.SIXEL).session() as session:
+        assert session.draw(buffer) == expected
+        assert session.draw(buffer) == expected
+        assert session.palette_builds == 1
+        session.draw(255 - buffer[::-1])
+        assert session.palette_builds == 2
+
+
+def test_draw_sixel_session_with_numpy_encoder():
+    os.environ["TERM"] = ""
+    buffer = np.random.RandomState(0).randint(0, 256, (12, 8, 3), dtype=np.uint8)
+    drawer = SixelDrawer("numpy")
+
+    with drawer.session() as session:
+        assert session.draw(buffer) == drawer.draw(buffer)
+
+
+def test_draw_to_sixel():
+    os.environ["TERM"] = ""
+    buffer = np.random.RandomState(0).randint(0, 256, (12, 8, 3), dtype=np.uint8)
+    drawer = get_drawer(Mode.SIXEL)
+    expected = drawer.draw_bytes(buffer)
+
+    stream = BytesIO()
+    drawer.draw_to(stream, buffer)
+    assert stream.getvalue() == expected
+    assert drawer.draw(buffer) == expected.decode("ascii")
+
+
+def test_draw_sixel_with_palette():
+    os.environ["TERM"] = ""
+    labels = np.repeat(np.arange(4), 6).reshape(4, 6)
+    colors = np.array([[0, 0, 0], [255, 0, 0], [0, 255, 0], [0, 0, 255]])
+    drawer = get_drawer(Mode.SIXEL)
+
+    actual = drawer.draw(labels, palette=colors)
+    assert actual.startswith('\x1bP7;1;75q"1;1;6;4')
+    assert drawer.draw(colors[labels].astype(np.uint8), palette="websafe")
+    with pytest.raises(ValueError):
+        drawer.draw(labels, palette=colors[:3])
+    with pytest.raises(ValueError):
+        drawer.draw(labels, palette=colors / 255.0)
+    with pytest.raises(ValueError):
+        drawer.draw(labels, palette=colors * 2)
+
+
+@pytest.mark.parametrize("encoder", ["auto", "numpy"])
+def test_draw_sixel_in_parallel(encoder):
+    os.environ["TERM"] = ""
+    buffer = np.random.RandomState(0).randint(0, 256, (40, 8), dtype=np.uint8)
+    actual = SixelDrawer(encoder, workers=4).draw_bytes(buffer)
+
+    assert actual.startswith(b'\x1bP7;1;75q"1;1;8;40')
+    assert actual.count(b"\x1bP") == 1
+    assert actual == SixelDrawer("numpy").draw_bytes(buffer)
+
+
+def test_libsixel_does_not_support_workers():
+    with pytest.raises(ValueError):
+        SixelDrawer("libsixel", workers=4)
+
+
+@pytest.mark.parametrize(
+    "mode", [Mode.BRAILLE, Mode.COLOR_BRAILLE, Mode.HALF_BLOCK, Mode.QUADRANT]
+)
+def test_draw_normalized_input(mode):
+    os.environ["TERM"] = ""
+    gray = np.random.RandomState(0).randint(0, 256, (8, 6), dtype=np.uint8)
+    rgb = np.repeat(gray, 3).reshape(8, 6, 3)
+    drawer = get_drawer(mode)
+
+    expected = drawer.draw(gray)
+    assert drawer.draw(rgb) == expected
+    assert drawer.draw(np.ascontiguousarray(rgb.transpose(2, 0, 1))) == expected
+    assert drawer.draw(gray / 255.0) == expected
+    assert drawer.draw((gray / 255.0).astype(np.float32)) == expected
+    assert drawer.draw(gray.astype(np.int32)) == expected
+    assert drawer.draw(gray.astype(np.int64)) == expected
+    assert drawer.draw(gray.astype(np.uint16) * 257) == expected
+    assert drawer.draw(gray.astype(np.uint16) + 1000, window=(1000, 1255)) == expected
+
+    opaque = np.dstack([rgb, np.full((8, 6), 255, dtype=np.uint8)])
+    assert drawer.draw(opaque) == expected
+    transparent = np.zeros((8, 6, 4), dtype=np.uint8)
+    assert drawer.draw(transparent, background=255) == drawer.draw(gray | 255)
+
+
+def test_draw_sixel_normalized_input():
+    os.environ["TERM"] = ""
+    gray = np.random.RandomState(0).randint(0, 256, (12, 8), dtype=np.uint8)
+    drawer = SixelDrawer("numpy")
+
+    expected = drawer.draw(gray)
+    assert drawer.draw(gray.astype(np.uint16) * 257) == expected
+    assert drawer.draw(np.dstack([gray, np.full((12, 8), 255, np.uint8)])) == expected
+
+
+def test_viewport():
+    os.environ["TERM"] = ""
+    buffer = np.random.RandomState(0).randint(0, 256, (1024, 2048, 3), dtype=np.uint8)
+    drawer = get_drawer(Mode.HALF_BLOCK)
+    viewport = Viewport(drawer, buffer, (32, 64), shrink_to_terminal=False)
+
+    assert viewport.draw() == drawer.draw(
+        viewport.pyramid.get_level(5), shrink_to_terminal=False
+    )
+    assert viewport.pyramid.built == 6
+
+    for _ in range(5):
+        assert viewport.press("+")
+    assert viewport.get_window() == (0, 496, 992, 32, 64)
+    expected = drawer.draw(buffer[496:528, 992:1056], shrink_to_terminal=False)
+    assert viewport.draw() == expected
+
+    assert viewport.press("l")
+    assert viewport.get_window() == (0, 496, 1008, 32, 64)
+    assert viewport.press("0") and viewport.get_window()[0] == 5
+
+
+class _SlowDrawer:
+    def __init__(self, seconds):
+        self.seconds = seconds
+
+    def draw(self, buffer):
+        time.sleep(self.seconds)
+        return str(int(buffer))
+
+
+def test_player_drops_late_frames():
+    stream = StringIO()
+    stats = Player(_SlowDrawer(0.02), fps=200, stream=stream).play(range(20))
+
+    assert 0 < stats.dropped and stats.written + stats.dropped == 20
+    assert stream.getvalue().count("\x1b[1A\r") == stats.written - 1
+
+
+def test_player_shows_frames_of_slow_source():
+    def _frames():
+        for i in range(5):
+            time.sleep(0.02)
+            yield i
+
+    stats = Player(_SlowDrawer(0.0), fps=200, stream=StringIO()).play(_frames())
+    assert stats.written == 5 and stats.dropped == 0
+    assert 0 < stats.fps < 60
+
+
+def test_player_scrolls_in_graphics_before_saving_cursor():
+    set_terminal_geometry(24, 80)
+    stream = StringIO()
+    frames = [np.full((40, 8), v, dtype=np.uint8) for v in [0, 255]]
+    Player(SixelDrawer("numpy"), fps=100, stream=stream).play(frames)
+    reset_terminal_geometry()
+
+    # 40 pixels are 3 lines of 16 pixels cells
+    scroll_in = "\n\n\n\x1b[3A\x1b7\x1bP"
+    written = stream.getvalue()
+    assert written.count(scroll_in) == 2
+    assert written.count("\x1b8" + scroll_in) == 1
+
+
+def test_player_raises_error_of_drawer():
+    with pytest.raises(ValueError):
+        Player(Mode.HALF_BLOCK, stream=StringIO()).play(
+            [np.zeros((2, 2), dtype=np.complex64)]
+        )
+
+
+@pytest.mark.parametrize(
+    "mode", [Mode.BRAILLE, Mode.COLOR_BRAILLE, Mode.HALF_BLOCK_256, Mode.SEXTANT]
+)
+def test_delta_renderer(mode):
+    buffer = np.random.RandomState(0).randint(0, 256, (96, 96, 3), dtype=np.uint8)
+    drawer = get_drawer(mode)
+    renderer = DeltaRenderer(drawer)
+    options = {"shrink_to_terminal": False}
+    # error diffusion of floyd steinberg spreads local changes
+    if mode in [Mode.BRAILLE, Mode.COLOR_BRAILLE]:
+        options["dither"] = "ordered"
+
+    full = renderer.render(buffer, **options)
+    assert full.endswith("\n") and renderer.full_redraws == 1
+    assert renderer.render(buffer, **options) == ""
+
+    buffer[40:44, 40:44] = 255 - buffer[40:44, 40:44]
+    delta = renderer.render(buffer, **options)
+    assert 0 < len(delta) and 10 * len(delta) < len(full)
+    assert renderer.full_redraws == 1
+
+    delta = renderer.render(255 - buffer, **options)
+    assert delta.startswith("\x1b[")
+    assert renderer.full_redraws == 2 and 0.5 < renderer.changed_fraction
+
+
+def test_sixel_delta_renderer():
+    set_terminal_geometry(24, 80)
+    buffer = np.random.RandomState(0).randint(0, 256, (96, 256, 3), dtype=np.uint8)
+    renderer = SixelDeltaRenderer()
+    options = {"shrink_to_terminal": False}
+
+    full = renderer.render(buffer, **options)
+    assert full.count("\x1bP") == 1 and full.endswith("\x1b8\x1b[6B")
+    assert renderer.render(buffer, **options) == ""
+
+    buffer[50:54, 70:74] = 255 - buffer[50:54, 70:74]
+    delta = renderer.render(buffer, **options)
+    assert delta.startswith('\x1b8\x1b[3B\x1b[8C\x1bP7;1;75q"1;1;64;48')
+    assert delta.count("\x1bP") == 1 and 5 * len(delta) < len(full)
+    assert renderer.full_redraws == 1 and renderer.changed_fraction == 1 / 8
+
+    renderer.render(255 - buffer, **options)
+    assert renderer.full_redraws == 2
+    reset_terminal_geometry()
+
+    with pytest.raises(ValueError):
+        SixelDeltaRenderer(palette=None)
+
+
+class _SumDrawer:
+    def draw(self, buffer, weights):
+        return str(int((buffer.sum() * weights).sum()))
+
+
+def test_cached_drawer_keys_array_arguments():
+    drawer = CachedDrawer(_SumDrawer())
+    buffer = np.ones((2, 2), dtype=np.uint8)
+    weights = np.zeros(2000, dtype=np.int64)
+    assert drawer.draw(buffer, weights) == "0"
+    weights[1000] = 1
+    assert drawer.draw(buffer, weights) == "4"
+
+
+def test_cached_drawers_share_cache_by_configuration():
+    cache = RenderCache()
+    buffer = np.random.RandomState(0).randint(0, 256, (8, 8, 3), dtype=np.uint8)
+    truecolor = CachedDrawer(get_drawer(Mode.HALF_BLOCK), cache)
+    xterm256 = CachedDrawer(get_drawer(Mode.HALF_BLOCK_256), cache)
+
+    expected = xterm256.drawer.draw(buffer)
+    assert truecolor.draw(buffer) != expected
+    assert xterm256.draw(buffer) == expected
+    assert cache.hits == 0 and len(cache) == 2
+
+
+def test_cached_drawer_restores_state_of_drawer():
+    drawer = CachedDrawer(get_drawer(Mode.HALF_BLOCK_256))
+    flat = np.zeros((8, 8, 3), dtype=np.uint8)
+    noise = np.random.RandomState(0).randint(0, 256, (8, 8, 3), dtype=np.uint8)
+    drawer.draw(flat, shrink_to_terminal=False, elide_repeated_sgr=True)
+    saved_bytes = drawer.saved_bytes
+    drawer.draw(noise, shrink_to_terminal=False, elide_repeated_sgr=True)
+    assert drawer.saved_bytes != saved_bytes
+
+    drawer.draw(flat, shrink_to_terminal=False, elide_repeated_sgr=True)
+    assert drawer.cache.hits == 1 and drawer.saved_bytes == saved_bytes
+
+
+@pytest.mark.parametrize("dtype", [np.uint8, np.uint16, np.float32])
+def test_reduce_by_box_keeps_edges(dtype):
+    buffer = np.zeros((7, 10, 3), dtype=dtype)
+    buffer[-1, :] = 100
+    buffer[:, -1] = 100
+    reduced = reduce_by_box(buffer, (3, 4))
+
+    assert reduced.shape == (3, 3, 3)
+    assert (reduced[-1, :-1] == 100).all() and (reduced[:-1, -1] == 50).all()
+    assert (reduced[:-1, :-1] == 0).all()
+
+
+def test_geometry_cache_is_bypassed_after_handler_is_replaced():
+    previous = signal.getsignal(signal.SIGWINCH)
+    try:
+        assert enable_geometry_cache()
+        assert get_terminal_geometry() is get_terminal_geometry()
+        signal.signal(signal.SIGWINCH, signal.SIG_IGN)
+        assert get_terminal_geometry() is not get_terminal_geometry()
+    finally:
+        disable_geometry_cache()
+        signal.signal(signal.SIGWINCH, previous)